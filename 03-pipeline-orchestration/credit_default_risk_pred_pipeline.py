@@ -1,5 +1,6 @@
+import os
+import sys
 import argparse
-import pandas as pd
 import numpy as np
 import pickle
 import mlflow
@@ -7,10 +8,13 @@ import xgboost as xgb
 from sklearn.metrics import roc_auc_score
 from mlflow.tracking import MlflowClient
 
+sys.path.append(os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")))
+from common.data_access import CAT_COLS, NUM_COLS, read_frame  # noqa: E402
+
 def evaluate_model(x_test_path, y_test_path, run_id, model_bundle_artifact_path):
     # Load test data
     print("Loading test data...")
-    X_test = pd.read_parquet(x_test_path)
+    X_test = read_frame(x_test_path, columns=NUM_COLS + CAT_COLS)
     y_test = np.loadtxt(y_test_path)
 
     # Set tracking URI
@@ -27,10 +31,7 @@ def evaluate_model(x_test_path, y_test_path, run_id, model_bundle_artifact_path)
     dv = model_bundle["vectorizer"]
 
     # Transform test data
-    cat_cols = ['AGE_GROUP', 'YEARS_EMPLOYED_GROUP', 'PHONE_CHANGE_GROUP']
-    num_cols = ['REGION_RATING_CLIENT_W_CITY', 'REGION_RATING_CLIENT',
-                'EXT_SOURCE_3', 'EXT_SOURCE_2', 'EXT_SOURCE_1', 'FLOORSMAX_AVG']
-    X_test_transformed = dv.transform(X_test[cat_cols + num_cols].to_dict(orient="records"))
+    X_test_transformed = dv.transform(X_test[CAT_COLS + NUM_COLS].to_dict(orient="records"))
 
     # Predictions
     print("Making predictions...")
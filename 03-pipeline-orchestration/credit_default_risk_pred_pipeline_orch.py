@@ -1,4 +1,5 @@
 import os
+import sys
 import pandas as pd
 import numpy as np
 import pickle
@@ -16,13 +17,27 @@ MLFLOW_DB_PATH = os.path.abspath(os.path.join(BASE_DIR, "../cred_risk_sqlite_aws
 DEFAULT_X_TEST = os.path.join(DATA_DIR, "X_test.parquet")
 DEFAULT_Y_TEST = os.path.join(DATA_DIR, "y_test.txt")
 
+sys.path.append(os.path.normpath(os.path.join(BASE_DIR, "..")))
+from common.data_access import CAT_COLS, NUM_COLS, read_frame  # noqa: E402
+from credit_default_risk_preprocessing import (  # noqa: E402
+    DEFAULT_INPUT, DEFAULT_OUTPUT_DIR, preprocess_applications,
+)
+
 # ------------------ Prefect Tasks ------------------
 
+@task
+def preprocess_data(input_path: str, output_dir: str, rebuild: bool = False):
+    """Incrementally rebuild the processed application features (unchanged partitions are skipped)."""
+    report = preprocess_applications(input_path, output_dir, rebuild=rebuild)
+    print(f"Preprocessing: {report}")
+    return report
+
+
 @task
 def load_test_data(x_test_path: str, y_test_path: str):
     """Load test data from files."""
     print(f"Loading test data from:\n  X: {x_test_path}\n  y: {y_test_path}")
-    X_test = pd.read_parquet(x_test_path)
+    X_test = read_frame(x_test_path, columns=NUM_COLS + CAT_COLS)
     y_test = np.loadtxt(y_test_path)
     return X_test, y_test
 
@@ -46,14 +61,9 @@ def load_model_bundle(run_id: str, model_bundle_artifact_path: str):
 @task
 def transform_data(X_test: pd.DataFrame, model_bundle: dict):
     """Transform test data using the vectorizer."""
-    cat_cols = ['AGE_GROUP', 'YEARS_EMPLOYED_GROUP', 'PHONE_CHANGE_GROUP']
-    num_cols = [
-        'REGION_RATING_CLIENT_W_CITY', 'REGION_RATING_CLIENT',
-        'EXT_SOURCE_3', 'EXT_SOURCE_2', 'EXT_SOURCE_1', 'FLOORSMAX_AVG'
-    ]
     dv = model_bundle["vectorizer"]
     X_test_transformed = dv.transform(
-        X_test[cat_cols + num_cols].to_dict(orient="records")
+        X_test[CAT_COLS + NUM_COLS].to_dict(orient="records")
     )
     return X_test_transformed
 
@@ -80,6 +90,15 @@ def log_metrics(client: MlflowClient, run_id: str, auc: float):
 
 # ------------------ Prefect Flow ------------------
 
+@flow(name="Credit Default Preprocessing Pipeline")
+def preprocessing_pipeline(
+    input_path: str = DEFAULT_INPUT,
+    output_dir: str = DEFAULT_OUTPUT_DIR,
+    rebuild: bool = False
+):
+    return preprocess_data(input_path, output_dir, rebuild)
+
+
 @flow(name="MLflow Model Evaluation Pipeline")
 def model_evaluation_pipeline(
     x_test_path: str = DEFAULT_X_TEST,
@@ -0,0 +1,195 @@
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import resource
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# ------------------ Path Setup ------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INPUT = os.path.normpath(os.path.join(BASE_DIR, "../data/application_data.parquet"))
+DEFAULT_OUTPUT_DIR = os.path.normpath(os.path.join(BASE_DIR, "../processed_data/applications"))
+
+sys.path.append(os.path.normpath(os.path.join(BASE_DIR, "..")))
+from common.data_access import CAT_COLS, NUM_COLS, optimize_table  # noqa: E402
+from common.raw_transform import RAW_COLS, RawApplicationTransform  # noqa: E402
+
+# ------------------ Config ------------------
+# Columns the training notebook keeps after its null/correlation analysis
+ID_COL = "SK_ID_CURR"
+TARGET_COL = "TARGET"
+INPUT_COLS = [ID_COL, TARGET_COL] + RAW_COLS
+
+CHUNK_ROWS = 64 * 1024
+# Leading underscores keep these out of pq.read_table(output_dir)
+MANIFEST_NAME = "_manifest.json"
+TRANSFORM_NAME = "_raw_transform.json"
+# Bump when the processing below changes, so every partition is rebuilt
+STAGE_VERSION = 1
+
+# Deterministic 70/15/15 split on a hash of SK_ID_CURR, so a row keeps its
+# split no matter which chunk it lands in
+SPLITS = [("train", 0.70), ("val", 0.85), ("test", 1.0)]
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (ru_maxrss is KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def assign_split(ids: np.ndarray) -> np.ndarray:
+    # Knuth multiplicative hash -> uniform in [0, 1)
+    u = ((ids.astype(np.uint64) * np.uint64(2654435761)) % np.uint64(2 ** 32)) / 2 ** 32
+    labels = np.array([name for name, _ in SPLITS], dtype=object)
+    return labels[np.searchsorted([edge for _, edge in SPLITS], u, side="right")]
+
+
+def fit_transform(input_path: str) -> RawApplicationTransform:
+    """Fits the imputation constants, reading only the median columns."""
+    columns = RawApplicationTransform.MEDIAN_COLS
+    table = pq.read_table(input_path, columns=columns, memory_map=True)
+    return RawApplicationTransform.fit({col: table.column(col).to_numpy() for col in columns})
+
+
+def chunk_content_hash(batch: pa.RecordBatch) -> str:
+    """Hash of an input chunk's rows alone, whatever transform they go through."""
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return hashlib.blake2b(sink.getvalue(), digest_size=16).hexdigest()
+
+
+def chunk_fingerprint(content_hash: str, transform_state: str) -> str:
+    """Content hash of an input chunk plus everything that shapes its output."""
+    state = f"v{STAGE_VERSION}|{SPLITS}|{transform_state}|{content_hash}"
+    return hashlib.blake2b(state.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def process_chunk(batch: pa.RecordBatch, transform: RawApplicationTransform) -> pa.Table:
+    columns = {col: batch.column(col).to_numpy(zero_copy_only=False).astype(np.float64) for col in RAW_COLS}
+    features = transform.transform(columns)
+    ids = batch.column(ID_COL).to_numpy(zero_copy_only=False)
+
+    table = pa.table({
+        ID_COL: ids,
+        "split": assign_split(ids),
+        TARGET_COL: batch.column(TARGET_COL),
+        **{col: features.nums[:, j] for j, col in enumerate(NUM_COLS)},
+        **{col: features.cats[:, j].astype(str) for j, col in enumerate(CAT_COLS)},
+    })
+    return optimize_table(table, categorical=CAT_COLS + ["split"], downcast=False)
+
+
+def _write_atomic(path: str, table: pa.Table):
+    tmp_path = f"{path}.tmp"
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+
+def load_manifest(output_dir: str) -> dict:
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"partitions": {}}
+    with open(path) as f_in:
+        return json.load(f_in)
+
+
+def new_partitions(manifest: dict, previous: dict) -> list:
+    """
+    Partitions of `manifest` whose input rows are not in `previous` (e.g.
+    the manifest logged with a model's training run). Matching is on the
+    raw content hash, so a rebuild, a refit of the transform, a copy or a
+    renumbered chunk does not make old rows look new.
+    """
+    if any("content" not in entry for entry in manifest["partitions"].values()):
+        raise ValueError("Manifest predates content hashes; rerun credit_default_risk_preprocessing.py")
+    seen = {entry.get("content") for entry in previous["partitions"].values()}
+    return sorted(name for name, entry in manifest["partitions"].items() if entry["content"] not in seen)
+
+
+def load_or_fit_transform(input_path: str, output_dir: str, refit: bool) -> RawApplicationTransform:
+    """
+    Reuses the transform stored with the partitions. Refitting moves the
+    medians, which changes every partition with a missing value.
+    """
+    path = os.path.join(output_dir, TRANSFORM_NAME)
+    if not refit and os.path.exists(path):
+        with open(path) as f_in:
+            return RawApplicationTransform.from_dict(json.load(f_in))
+    transform = fit_transform(input_path)
+    with open(path, "w") as f_out:
+        json.dump(transform.to_dict(), f_out, indent=2)
+    return transform
+
+
+def preprocess_applications(input_path: str = DEFAULT_INPUT, output_dir: str = DEFAULT_OUTPUT_DIR,
+                            chunk_rows: int = CHUNK_ROWS, rebuild: bool = False, refit: bool = False) -> dict:
+    """
+    Raw applications -> partitioned model features (one Parquet file per
+    input chunk, with TARGET and a train/val/test `split` column).
+
+    Only the needed columns are read, one row-group chunk at a time.
+    Partitions whose content hash matches the manifest are skipped, so a
+    rerun on unchanged input only reads and hashes. The raw transform is
+    fitted on the first run (or with `refit`/`rebuild`) and stored next to
+    the partitions, for the model bundle.
+    Returns a report with row/partition counts, runtime and peak RSS.
+    """
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {"partitions": {}} if rebuild else load_manifest(output_dir)
+
+    transform = load_or_fit_transform(input_path, output_dir, refit or rebuild)
+    transform_state = json.dumps(transform.to_dict(), sort_keys=True)
+
+    parquet_file = pq.ParquetFile(input_path, memory_map=True)
+    partitions = {}
+    written = skipped = rows = 0
+    for index, batch in enumerate(parquet_file.iter_batches(batch_size=chunk_rows, columns=INPUT_COLS)):
+        name = f"part-{index:05d}.parquet"
+        content = chunk_content_hash(batch)
+        fingerprint = chunk_fingerprint(content, transform_state)
+        previous = manifest["partitions"].get(name, {})
+        if previous.get("fingerprint") == fingerprint and os.path.exists(os.path.join(output_dir, name)):
+            skipped += 1
+        else:
+            _write_atomic(os.path.join(output_dir, name), process_chunk(batch, transform))
+            written += 1
+        partitions[name] = {"fingerprint": fingerprint, "content": content, "rows": batch.num_rows}
+        rows += batch.num_rows
+
+    # Partitions past the end of a shrunk input
+    for path in glob.glob(os.path.join(output_dir, "part-*.parquet")):
+        if os.path.basename(path) not in partitions:
+            os.remove(path)
+
+    with open(os.path.join(output_dir, MANIFEST_NAME), "w") as f_out:
+        json.dump({"version": STAGE_VERSION, "input": input_path, "partitions": partitions}, f_out, indent=2)
+
+    return {
+        "rows": rows,
+        "partitions_written": written,
+        "partitions_skipped": skipped,
+        "seconds": round(time.perf_counter() - start, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+# ------------------ CLI ------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental preprocessing of raw applications into model features.")
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="raw application Parquet file")
+    parser.add_argument("--output_dir", default=DEFAULT_OUTPUT_DIR, help="directory for the partitioned output")
+    parser.add_argument("--chunk_rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--rebuild", action="store_true", help="refit and rewrite every partition")
+    parser.add_argument("--refit", action="store_true", help="refit the imputation medians on this input")
+    args = parser.parse_args()
+
+    report = preprocess_applications(args.input, args.output_dir, args.chunk_rows, args.rebuild, args.refit)
+    print(json.dumps(report))
@@ -0,0 +1,424 @@
+import os
+import sys
+import glob
+import json
+import time
+import pickle
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+import psycopg
+import pyarrow.parquet as pq
+import mlflow
+import xgboost as xgb
+import pyarrow as pa
+from sklearn.feature_extraction import DictVectorizer
+from prefect import task, flow
+
+# ------------------ Path Setup ------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.normpath(os.path.join(BASE_DIR, "..")))
+sys.path.append(os.path.normpath(os.path.join(BASE_DIR, "../05-model-monitoring")))
+from common.data_access import CAT_COLS, NUM_COLS  # noqa: E402
+from common.raw_transform import RawApplicationTransform  # noqa: E402
+from common.serving_bundle import PICKLED_BUNDLE_ARTIFACT, SERVING_BUNDLE_ARTIFACT, write_serving_bundle  # noqa: E402
+from credit_default_metrics_rollup import DB_CONN_STR, DB_NAME, SOURCE_TABLE  # noqa: E402
+from credit_default_risk_preprocessing import (  # noqa: E402
+    DEFAULT_OUTPUT_DIR, MANIFEST_NAME, TARGET_COL, TRANSFORM_NAME, load_manifest, new_partitions,
+)
+from credit_default_risk_pred_pipeline_orch import (  # noqa: E402
+    MLFLOW_DB_PATH, load_model_bundle, transform_data, evaluate_model,
+)
+
+# ------------------ Config ------------------
+REGISTERED_MODEL_NAME = "credit_default_risk_xgb_model_v2"
+EXPERIMENT_NAME = "credit_default_risk_retraining"
+BUNDLE_ARTIFACT = PICKLED_BUNDLE_ARTIFACT
+
+# Best params from the experiment-tracking notebook; scale_pos_weight is
+# recomputed from the training labels
+TRAIN_PARAMS = {
+    "max_depth": 4,
+    "learning_rate": 0.13232,
+    "reg_alpha": 0.02965,
+    "reg_lambda": 0.1111,
+    "min_child_weight": 3.19211,
+    "subsample": 0.83768,
+    "colsample_bytree": 0.81102,
+    "objective": "binary:logistic",
+    "seed": 42,
+    "eval_metric": "auc",
+}
+FULL_RETRAIN_ROUNDS = 200
+WARM_START_ROUNDS = 50
+EARLY_STOPPING_ROUNDS = 50
+
+# Retrain when any of these is crossed over the lookback window.
+# prediction_drift is the mean drift score of the prediction column,
+# auc_min the worst batch AUC.
+DRIFT_THRESHOLDS = {
+    "prediction_drift": 0.1,
+    "num_drifted_columns": 2,
+    "share_missing_values": 0.2,
+    "auc_min": 0.70,
+}
+LOOKBACK_HOURS = 24
+
+# Share of new rows that may carry a feature the current vectorizer has
+# never seen (DictVectorizer.transform drops it silently) before warm
+# starting is refused
+MAX_UNSEEN_SHARE = 0.01
+
+drift_query = f"""
+select
+    count(*),
+    avg(prediction_drift),
+    max(num_drifted_columns),
+    avg(share_missing_values),
+    min(auc)
+from {SOURCE_TABLE}
+where date_time_created > (select max(date_time_created) from {SOURCE_TABLE}) - make_interval(hours => %s)
+"""
+
+
+def records(X: pd.DataFrame):
+    return X[CAT_COLS + NUM_COLS].to_dict(orient="records")
+
+
+def train_params(y: np.ndarray) -> dict:
+    neg, pos = np.bincount(y.astype(int), minlength=2)
+    return {**TRAIN_PARAMS, "scale_pos_weight": neg / max(pos, 1)}
+
+
+def split_xy(data: pd.DataFrame, split: str, new_only: bool = False):
+    """Features and labels of one split of `load_training_data`'s output."""
+    mask = data["split"] == split
+    if new_only:
+        mask &= data["is_new"]
+    return data.loc[mask, NUM_COLS + CAT_COLS], data.loc[mask, TARGET_COL].to_numpy()
+
+
+def load_raw_transform(data_path: str):
+    """The raw transform the preprocessing stage stored next to the partitions, if any."""
+    path = os.path.join(data_path, TRANSFORM_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f_in:
+        return RawApplicationTransform.from_dict(json.load(f_in))
+
+
+# ------------------ Prefect Tasks ------------------
+
+@task
+def read_drift_metrics(lookback_hours: int = LOOKBACK_HOURS):
+    """Aggregate the monitoring job's batch metrics over the last `lookback_hours` of batches."""
+    with psycopg.connect(f"{DB_CONN_STR} dbname={DB_NAME}") as conn:
+        row = conn.execute(drift_query, (lookback_hours,)).fetchone()
+    metrics = dict(zip(
+        ["num_batches", "prediction_drift", "num_drifted_columns", "share_missing_values", "auc_min"], row
+    ))
+    print(f"Drift metrics over the last {lookback_hours}h: {metrics}")
+    return metrics
+
+
+@task
+def check_drift_thresholds(metrics: dict, thresholds: dict):
+    """Return the thresholds crossed; an empty list means no retraining is needed."""
+    crossed = []
+    for name, limit in thresholds.items():
+        value = metrics.get(name)
+        if value is None:
+            continue
+        # auc_min is a floor, the rest are ceilings
+        if (value < limit) if name == "auc_min" else (value > limit):
+            crossed.append(f"{name}={value:.4f} (threshold {limit})")
+    print(f"Thresholds crossed: {crossed or 'none'}")
+    return crossed
+
+
+@task
+def load_trained_manifest(client, run_id: str):
+    """
+    The preprocessing manifest logged with `run_id`, i.e. the partitions
+    its model was trained on; None for runs logged without one (e.g. the
+    notebook's).
+    """
+    if MANIFEST_NAME not in {artifact.path for artifact in client.list_artifacts(run_id)}:
+        print(f"Run {run_id} has no {MANIFEST_NAME}; its training rows are unknown")
+        return None
+    with open(client.download_artifacts(run_id, MANIFEST_NAME)) as f_in:
+        return json.load(f_in)
+
+
+@task
+def load_training_data(data_path: str, trained_manifest: dict = None):
+    """
+    Load the processed partitions with their `split` column and an
+    `is_new` flag for rows of partitions whose input rows are not in
+    `trained_manifest` (without one, no row counts as new). Returns the
+    rows and the partitions' manifest, to log with the candidates.
+    """
+    print(f"Loading training data from: {data_path}")
+    paths = sorted(glob.glob(os.path.join(data_path, "part-*.parquet")))
+    if not paths:
+        raise FileNotFoundError(
+            f"No processed partitions in {data_path}; run credit_default_risk_preprocessing.py first"
+        )
+    manifest = load_manifest(data_path)
+    new = set(new_partitions(manifest, trained_manifest)) if trained_manifest is not None else set()
+
+    columns = NUM_COLS + CAT_COLS + [TARGET_COL, "split"]
+    tables = []
+    for path in paths:
+        table = pq.read_table(path, columns=columns)
+        is_new = os.path.basename(path) in new
+        tables.append(table.append_column("is_new", pa.array([is_new] * table.num_rows, type=pa.bool_())))
+    df = pa.concat_tables(tables).to_pandas()
+
+    df["split"] = df["split"].astype(str)
+    print(f"Loaded {len(df)} rows, {int(df['is_new'].sum())} from {len(new)} partitions the current model has not seen")
+    return df, manifest
+
+
+@task
+def check_vocabulary(model_bundle: dict, X_new: pd.DataFrame, max_unseen_share: float = MAX_UNSEEN_SHARE):
+    """
+    Check that the new data fits the current DictVectorizer before trees
+    are added on top of it: the booster must have one input per vocabulary
+    entry, and new rows must not depend on features the vectorizer would
+    drop (e.g. a category value that did not exist at training time).
+    Returns a report; `compatible` is False when warm starting is unsafe.
+    """
+    dv, booster = model_bundle["vectorizer"], model_bundle["model"]
+    vocabulary = dv.vocabulary_
+
+    if booster.num_features() != len(vocabulary):
+        return {"compatible": False, "reason": "booster and vectorizer feature counts differ",
+                "unseen_features": [], "unseen_share": None}
+
+    unseen_features = set()
+    unseen_rows = np.zeros(len(X_new), dtype=bool)
+    for col in CAT_COLS:
+        values = X_new[col].astype(str)
+        known = {name.split(dv.separator, 1)[1] for name in vocabulary if name.startswith(col + dv.separator)}
+        is_unseen = ~values.isin(known).to_numpy()
+        unseen_rows |= is_unseen
+        unseen_features.update(f"{col}{dv.separator}{v}" for v in values[is_unseen].unique())
+    missing_cols = [col for col in NUM_COLS if col not in vocabulary]
+    if missing_cols:
+        unseen_features.update(missing_cols)
+        unseen_rows[:] = True
+
+    unseen_share = float(unseen_rows.mean()) if len(unseen_rows) else 0.0
+    report = {
+        "compatible": unseen_share <= max_unseen_share,
+        "reason": None if unseen_share <= max_unseen_share else
+        f"{unseen_share:.2%} of new rows use features unknown to the vectorizer",
+        "unseen_features": sorted(unseen_features),
+        "unseen_share": unseen_share,
+    }
+    print(f"Vocabulary check: {report}")
+    return report
+
+
+@task
+def warm_start_training(model_bundle: dict, params: dict, X_train, y_train, X_val, y_val,
+                        num_boost_round: int = WARM_START_ROUNDS):
+    """Add trees to the current booster on the new data, keeping its vectorizer."""
+    start = time.perf_counter()
+    dv = model_bundle["vectorizer"]
+    dtrain = xgb.DMatrix(dv.transform(records(X_train)), label=y_train)
+    dval = xgb.DMatrix(dv.transform(records(X_val)), label=y_val)
+
+    # xgb.train copies xgb_model, so the current bundle is left untouched
+    model = xgb.train(
+        params,
+        dtrain,
+        num_boost_round=num_boost_round,
+        evals=[(dval, "eval")],
+        early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+        verbose_eval=10,
+        xgb_model=model_bundle["model"],
+    )
+    seconds = time.perf_counter() - start
+    print(f"Warm start: {model.num_boosted_rounds()} trees "
+          f"({model.num_boosted_rounds() - model_bundle['model'].num_boosted_rounds()} new) in {seconds:.2f}s")
+    return {"model": model, "vectorizer": dv}, seconds
+
+
+@task
+def full_retraining(params: dict, X_train, y_train, X_val, y_val, num_boost_round: int = FULL_RETRAIN_ROUNDS):
+    """Fit a new vectorizer and booster from scratch, as the notebook does."""
+    start = time.perf_counter()
+    dv = DictVectorizer()
+    dtrain = xgb.DMatrix(dv.fit_transform(records(X_train)), label=y_train)
+    dval = xgb.DMatrix(dv.transform(records(X_val)), label=y_val)
+
+    model = xgb.train(
+        params,
+        dtrain,
+        num_boost_round=num_boost_round,
+        evals=[(dval, "eval")],
+        early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+        verbose_eval=10,
+    )
+    seconds = time.perf_counter() - start
+    print(f"Full retrain: {model.num_boosted_rounds()} trees in {seconds:.2f}s")
+    return {"model": model, "vectorizer": dv}, seconds
+
+
+@task
+def register_candidate(model_bundle: dict, mode: str, params: dict, parent_run_id: str, auc: float,
+                       train_seconds: float, extra_metrics: dict, drift_reasons: list,
+                       manifest: dict, raw_transform: RawApplicationTransform = None):
+    """
+    Log a candidate in the notebook's pickled layout and as a serving
+    bundle (what the Lambda loads, with `raw_transform` if given), with
+    the preprocessing `manifest` of the partitions it was trained on, and
+    register it as a new model version.
+    """
+    mlflow.set_tracking_uri(f"sqlite:///{MLFLOW_DB_PATH}")
+    mlflow.set_experiment(EXPERIMENT_NAME)
+
+    with mlflow.start_run(run_name=f"xgboost-retrain-{mode}") as run:
+        mlflow.set_tag("model", "XGBoost")
+        mlflow.set_tag("retrain_mode", mode)
+        mlflow.set_tag("parent_run_id", parent_run_id)
+        mlflow.set_tag("drift_reasons", "; ".join(drift_reasons))
+        mlflow.log_params(params)
+        mlflow.log_metric("test_auc_prefect", auc)
+        mlflow.log_metric("train_seconds", train_seconds)
+        mlflow.log_metric("num_trees", model_bundle["model"].num_boosted_rounds())
+        mlflow.log_metrics(extra_metrics)
+        mlflow.log_dict(manifest, MANIFEST_NAME)
+
+        mlflow.xgboost.log_model(model_bundle["model"], artifact_path="models/xgboost_model")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            bundle_path = os.path.join(tmp_dir, BUNDLE_ARTIFACT)
+            with open(bundle_path, "wb") as f_out:
+                pickle.dump(model_bundle, f_out)
+            mlflow.log_artifact(bundle_path)
+
+            serving_path = os.path.join(tmp_dir, SERVING_BUNDLE_ARTIFACT)
+            with open(serving_path, "wb") as f_out:
+                write_serving_bundle(model_bundle["model"], model_bundle["vectorizer"], f_out, raw_transform)
+            mlflow.log_artifact(serving_path)
+
+        version = mlflow.register_model(
+            model_uri=f"runs:/{run.info.run_id}/models/xgboost_model",
+            name=REGISTERED_MODEL_NAME,
+        )
+    print(f"Registered {mode} candidate as {REGISTERED_MODEL_NAME} v{version.version} (run {run.info.run_id})")
+    return run.info.run_id, version.version
+
+
+# ------------------ Prefect Flow ------------------
+
+@flow(name="Credit Default Retraining Pipeline")
+def retraining_pipeline(
+    run_id: str = "fe69b7b9817240789feb57c59ff31cc5",
+    model_bundle_artifact_path: str = BUNDLE_ARTIFACT,
+    data_path: str = DEFAULT_OUTPUT_DIR,
+    lookback_hours: int = LOOKBACK_HOURS,
+    thresholds: dict = None,
+    warm_start_rounds: int = WARM_START_ROUNDS,
+    compare_full_retrain: bool = True,
+    force: bool = False
+):
+    """
+    Continue training the current model when the monitoring metrics cross
+    a threshold. The warm start only sees train rows from partitions
+    missing from the preprocessing manifest logged with the current
+    model's run; with `compare_full_retrain`, a from-scratch model is
+    fitted on every train row. The current model and the candidates are
+    evaluated on the `test` split of the processed data and the
+    candidates registered with the current manifest; promotion stays
+    manual and the current model's run is left untouched.
+    """
+    drift_reasons = check_drift_thresholds(read_drift_metrics(lookback_hours), thresholds or DRIFT_THRESHOLDS)
+    if not drift_reasons and not force:
+        print("No drift threshold crossed, keeping the current model.")
+        return None
+    drift_reasons = drift_reasons or ["forced"]
+
+    model_bundle, client = load_model_bundle(run_id, model_bundle_artifact_path)
+    trained_manifest = load_trained_manifest(client, run_id)
+    data, manifest = load_training_data(data_path, trained_manifest)
+    X_train, y_train = split_xy(data, "train")
+    X_new, y_new = split_xy(data, "train", new_only=True)
+    X_val, y_val = split_xy(data, "val")
+    X_test, y_test = split_xy(data, "test")
+
+    # The notebook's model was trained on its own split, which overlaps these
+    # test rows, so its AUC here is optimistic; models from this flow are not.
+    # It is logged with the candidates, never over the current run's metrics.
+    current_auc = evaluate_model(transform_data(X_test, model_bundle), y_test, model_bundle)
+
+    candidates = {}
+    vocabulary = check_vocabulary(model_bundle, pd.concat([X_new, X_val]))
+    if trained_manifest is None:
+        print("Skipping warm start: the current model's run has no preprocessing manifest")
+    elif not len(X_new):
+        print("Skipping warm start: every partition was already in the current model's training data")
+    elif not vocabulary["compatible"]:
+        print(f"Skipping warm start: {vocabulary['reason']}")
+    else:
+        params = train_params(y_new)
+        bundle, seconds = warm_start_training(model_bundle, params, X_new, y_new, X_val, y_val, warm_start_rounds)
+        candidates["warm_start"] = (bundle, params, seconds)
+    if compare_full_retrain or "warm_start" not in candidates:
+        params = train_params(y_train)
+        bundle, seconds = full_retraining(params, X_train, y_train, X_val, y_val)
+        candidates["full_retrain"] = (bundle, params, seconds)
+
+    results = {}
+    for mode, (bundle, _, seconds) in candidates.items():
+        auc = evaluate_model(transform_data(X_test, bundle), y_test, bundle)
+        results[mode] = {"auc": auc, "train_seconds": seconds}
+
+    print(f"{'candidate':<14}{'test AUC':>10}{'train s':>10}")
+    print(f"{'current':<14}{current_auc:>10.4f}{'-':>10}")
+    for mode, result in results.items():
+        print(f"{mode:<14}{result['auc']:>10.4f}{result['train_seconds']:>10.2f}")
+
+    raw_transform = load_raw_transform(data_path)
+    for mode, (bundle, params, seconds) in candidates.items():
+        extra = {
+            "champion_auc_on_partitioned_test": current_auc,
+            "unseen_share": vocabulary["unseen_share"] or 0.0,
+            "train_rows": len(X_new) if mode == "warm_start" else len(X_train),
+        }
+        if mode == "warm_start" and "full_retrain" in results:
+            full = results["full_retrain"]
+            extra.update({
+                "full_retrain_test_auc": full["auc"],
+                "full_retrain_seconds": full["train_seconds"],
+                "speedup_vs_full_retrain": full["train_seconds"] / seconds,
+            })
+        register_candidate(bundle, mode, params, run_id, results[mode]["auc"], seconds, extra, drift_reasons,
+                           manifest, raw_transform)
+
+    return results
+
+
+# ------------------ Deployment Setup ------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drift-triggered warm-start retraining of the credit default model.")
+    parser.add_argument("--run_id", default="fe69b7b9817240789feb57c59ff31cc5")
+    parser.add_argument("--data_path", default=DEFAULT_OUTPUT_DIR, help="partitioned output of the preprocessing stage")
+    parser.add_argument("--lookback_hours", type=int, default=LOOKBACK_HOURS)
+    parser.add_argument("--warm_start_rounds", type=int, default=WARM_START_ROUNDS)
+    parser.add_argument("--skip_full_retrain", action="store_true", help="do not train the from-scratch comparison")
+    parser.add_argument("--force", action="store_true", help="retrain even if no threshold is crossed")
+    args = parser.parse_args()
+
+    retraining_pipeline(
+        run_id=args.run_id,
+        data_path=args.data_path,
+        lookback_hours=args.lookback_hours,
+        warm_start_rounds=args.warm_start_rounds,
+        compare_full_retrain=not args.skip_full_retrain,
+        force=args.force,
+    )
@@ -0,0 +1,158 @@
+import os
+import json
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import credit_default_risk_preprocessing as preprocessing
+from common.raw_transform import RAW_COLS
+
+CHUNK_ROWS = 256
+
+
+def _applications(n: int = 1000, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    columns = {
+        "SK_ID_CURR": np.arange(100000, 100000 + n, dtype=np.int64),
+        "TARGET": (rng.random(n) < 0.1).astype(np.int64),
+        "DAYS_BIRTH": -rng.integers(20 * 365, 69 * 365, n).astype(np.float64),
+        "DAYS_EMPLOYED": -rng.integers(0, 40 * 365, n).astype(np.float64),
+        "DAYS_LAST_PHONE_CHANGE": -rng.integers(0, 4000, n).astype(np.float64),
+        "REGION_RATING_CLIENT_W_CITY": rng.integers(1, 4, n).astype(np.float64),
+        "REGION_RATING_CLIENT": rng.integers(1, 4, n).astype(np.float64),
+    }
+    for col in ["EXT_SOURCE_3", "EXT_SOURCE_2", "EXT_SOURCE_1", "FLOORSMAX_AVG"]:
+        values = rng.random(n)
+        values[rng.random(n) < 0.2] = np.nan
+        columns[col] = values
+    return columns
+
+
+def _write(path, columns: dict):
+    pq.write_table(pa.table(columns), path, row_group_size=CHUNK_ROWS)
+
+
+def _run(input_path, output_dir, **kwargs):
+    return preprocessing.preprocess_applications(str(input_path), str(output_dir), chunk_rows=CHUNK_ROWS, **kwargs)
+
+
+def _mtimes(output_dir) -> dict:
+    return {name: os.stat(output_dir / name).st_mtime_ns for name in os.listdir(output_dir)
+            if name.startswith("part-")}
+
+
+def test_build_writes_one_partition_per_chunk_with_transformed_features(tmp_path):
+    input_path, output_dir = tmp_path / "applications.parquet", tmp_path / "out"
+    columns = _applications()
+    _write(input_path, columns)
+
+    report = _run(input_path, output_dir)
+
+    assert (report["rows"], report["partitions_written"], report["partitions_skipped"]) == (1000, 4, 0)
+    table = pq.read_table(output_dir)
+    assert table.num_rows == 1000
+    assert set(table.column("split").to_pylist()) == {"train", "val", "test"}
+
+    with open(output_dir / preprocessing.TRANSFORM_NAME) as f_in:
+        transform = preprocessing.RawApplicationTransform.from_dict(json.load(f_in))
+    expected = transform.transform({col: columns[col] for col in RAW_COLS})
+    table = table.sort_by("SK_ID_CURR")
+    assert table.column("AGE_GROUP").to_pylist() == expected.cats[:, 0].tolist()
+    assert np.allclose(table.column("EXT_SOURCE_1").to_numpy(), expected.nums[:, 4])
+
+
+def test_unchanged_input_rewrites_nothing(tmp_path):
+    input_path, output_dir = tmp_path / "applications.parquet", tmp_path / "out"
+    _write(input_path, _applications())
+    _run(input_path, output_dir)
+    before = _mtimes(output_dir)
+
+    report = _run(input_path, output_dir)
+
+    assert (report["partitions_written"], report["partitions_skipped"]) == (0, 4)
+    assert _mtimes(output_dir) == before
+
+
+def test_one_changed_value_rewrites_only_its_chunk(tmp_path):
+    input_path, output_dir = tmp_path / "applications.parquet", tmp_path / "out"
+    columns = _applications()
+    _write(input_path, columns)
+    _run(input_path, output_dir)
+    before = _mtimes(output_dir)
+
+    columns["EXT_SOURCE_2"][300] = 0.123  # row 300 is in the second chunk
+    _write(input_path, columns)
+    report = _run(input_path, output_dir)
+
+    assert (report["partitions_written"], report["partitions_skipped"]) == (1, 3)
+    after = _mtimes(output_dir)
+    assert [name for name in before if after[name] != before[name]] == ["part-00001.parquet"]
+    row = pq.read_table(output_dir / "part-00001.parquet").to_pandas().set_index("SK_ID_CURR").loc[100300]
+    assert row["EXT_SOURCE_2"] == 0.123
+
+
+def test_shrunk_input_removes_trailing_partitions(tmp_path):
+    input_path, output_dir = tmp_path / "applications.parquet", tmp_path / "out"
+    columns = _applications()
+    _write(input_path, columns)
+    _run(input_path, output_dir)
+
+    _write(input_path, {col: values[:600] for col, values in columns.items()})
+    report = _run(input_path, output_dir)
+
+    # chunks 0 and 1 are unchanged, chunk 2 lost rows, chunk 3 is gone
+    assert (report["rows"], report["partitions_written"], report["partitions_skipped"]) == (600, 1, 2)
+    assert sorted(_mtimes(output_dir)) == [f"part-0000{i}.parquet" for i in range(3)]
+    with open(output_dir / preprocessing.MANIFEST_NAME) as f_in:
+        assert sorted(json.load(f_in)["partitions"]) == sorted(_mtimes(output_dir))
+    assert pq.read_table(output_dir).num_rows == 600
+
+
+def test_stored_transform_is_reused_until_refit(tmp_path):
+    input_path, output_dir = tmp_path / "applications.parquet", tmp_path / "out"
+    columns = _applications()
+    _write(input_path, columns)
+    _run(input_path, output_dir)
+    transform_path = output_dir / preprocessing.TRANSFORM_NAME
+    with open(transform_path) as f_in:
+        fitted = json.load(f_in)
+
+    # Moves every median, but the first chunk alone changes
+    columns["EXT_SOURCE_3"][:CHUNK_ROWS] = 0.99
+    _write(input_path, columns)
+    report = _run(input_path, output_dir)
+
+    assert report["partitions_written"] == 1
+    with open(transform_path) as f_in:
+        assert json.load(f_in) == fitted
+
+    report = _run(input_path, output_dir, refit=True)
+
+    # New medians change the fill of every chunk with a missing value
+    assert report["partitions_written"] == 4
+    with open(transform_path) as f_in:
+        assert json.load(f_in)["fill_values"]["EXT_SOURCE_3"] != fitted["fill_values"]["EXT_SOURCE_3"]
+
+
+def test_touched_or_rebuilt_partitions_with_unchanged_rows_are_not_new(tmp_path):
+    input_path, output_dir = tmp_path / "applications.parquet", tmp_path / "out"
+    columns = _applications()
+    _write(input_path, columns)
+    _run(input_path, output_dir)
+    trained = preprocessing.load_manifest(str(output_dir))
+
+    for name in _mtimes(output_dir):
+        os.utime(output_dir / name)
+    assert preprocessing.new_partitions(preprocessing.load_manifest(str(output_dir)), trained) == []
+
+    # Rewrites every partition, but no input row changed
+    _run(input_path, output_dir, rebuild=True)
+    assert preprocessing.new_partitions(preprocessing.load_manifest(str(output_dir)), trained) == []
+
+    columns["EXT_SOURCE_1"][900] = 0.5  # row 900 is in the last chunk
+    _write(input_path, columns)
+    _run(input_path, output_dir, refit=True)
+    assert preprocessing.new_partitions(preprocessing.load_manifest(str(output_dir)), trained) == [
+        "part-00003.parquet"
+    ]
@@ -14,6 +14,7 @@ MODEL_KEY = f"{RUN_ID}/artifacts/xgb_credit_pred.bin"
 
 PREDICTIONS_STREAM_NAME = os.getenv("PREDICTIONS_STREAM_NAME", "ride_predictions")
 TEST_RUN = os.getenv("TEST_RUN", "false").lower() == "true"
+DEAD_LETTER_PATH = os.getenv("DEAD_LETTER_PATH")  # e.g. /tmp/dead_letter.jsonl
 
 kinesis_client = boto3.client("kinesis")
 
@@ -25,6 +26,10 @@ model_bundle = pickle.load(response["Body"])
 model = model_bundle["model"]         # XGBoost Booster
 dv = model_bundle["vectorizer"]       # DictVectorizer
 
+# Model inputs, read off the vectorizer: categoricals are one-hot as "col=value"
+CAT_COLS = sorted({name.split(dv.separator, 1)[0] for name in dv.feature_names_ if dv.separator in name})
+NUM_COLS = [name for name in dv.feature_names_ if dv.separator not in name]
+
 print("Model and vectorizer loaded successfully.")
 
 # --- PREDICT FUNCTION ---
@@ -40,66 +45,151 @@ def predict(features: dict) -> float:
     return float(prediction)
 
 
+# --- POISON RECORDS ---
+def prep_features(data: dict) -> dict:
+    """
+    Keeps the model's inputs only, coerced as in 06-best-practises'
+    prep_features: categoricals as strings (missing -> ""), numerics as
+    floats (missing -> 0.0, NaN kept as missing). Raises ValueError for a
+    value that cannot be coerced, which would fail the vectorizer on
+    every retry.
+    """
+    features = {}
+    for col in CAT_COLS:
+        val = data.get(col, "")
+        if not isinstance(val, (str, int, float, bool)):
+            raise ValueError(f"{col} must be a string, got {type(val).__name__}")
+        features[col] = str(val)
+    for col in NUM_COLS:
+        val = data.get(col)
+        if val is None:
+            features[col] = 0.0
+            continue
+        if isinstance(val, bool) or not isinstance(val, (int, float, str)):
+            raise ValueError(f"{col} must be a number, got {type(val).__name__}")
+        try:
+            features[col] = float(val)
+        except ValueError:
+            raise ValueError(f"{col} must be a number, got {val!r}") from None
+    return features
+
+
+def decode_record(record):
+    """
+    Decodes one Kinesis record into (features, data_id).
+    Raises ValueError for records that can never be processed.
+    """
+    try:
+        encoded_data = record["kinesis"]["data"]
+        decoded_data = base64.b64decode(encoded_data).decode("utf-8")
+        credit_pred_event = json.loads(decoded_data)
+        data = credit_pred_event["data"]
+    except Exception as e:
+        raise ValueError(f"{type(e).__name__}: {e}") from e
+    if not isinstance(data, dict):
+        raise ValueError(f"'data' must be an object, got {type(data).__name__}")
+    return prep_features(data), credit_pred_event.get("data_id", "N/A")
+
+
+def dead_letter(record, error):
+    """Appends a poison record to the local dead-letter file. Returns True if it was written."""
+    if not DEAD_LETTER_PATH:
+        return False
+    entry = {
+        "sequenceNumber": record["kinesis"].get("sequenceNumber"),
+        "data": record["kinesis"].get("data"),
+        "error": str(error),
+    }
+    try:
+        with open(DEAD_LETTER_PATH, "a") as f_out:
+            f_out.write(json.dumps(entry) + "\n")
+    except OSError as e:
+        print("Dead-letter write failed:", str(e))
+        return False
+    return True
+
+
+def build_prediction_event(data_id, prob):
+    return {
+        "model": "credit-default-risk-prediction",
+        "version": "v1.0",
+        "prediction": {
+            "data_id": data_id,
+            "default_probability": prob,
+            "default_risk": "High" if prob >= 0.5 else "Low",
+        },
+    }
+
+
+def handle_kinesis_batch(records):
+    """
+    Processes records in order and stops at the first one that fails.
+    Kinesis retries from the lowest reported sequence number, so records
+    before it are never scored again and records after it are left for
+    the retry. Poison records (undecodable, unusable features, or failing
+    the model) are dead-lettered (when DEAD_LETTER_PATH is set) and
+    skipped instead of blocking the shard; only put_record failures are
+    treated as transient.
+    """
+    predictions = []
+    batch_item_failures = []
+
+    for record in records:
+        sequence_number = record["kinesis"].get("sequenceNumber")
+        try:
+            data, data_id = decode_record(record)
+            prob = predict(data)
+        except Exception as e:
+            # Same input, same model: a retry fails the same way
+            print(f"Poison record {sequence_number}:", f"{type(e).__name__}: {e}")
+            if dead_letter(record, e):
+                continue
+            batch_item_failures.append({"itemIdentifier": sequence_number})
+            break
+
+        prediction_event = build_prediction_event(data_id, prob)
+        try:
+            if not TEST_RUN:
+                kinesis_client.put_record(
+                    StreamName=PREDICTIONS_STREAM_NAME,
+                    Data=json.dumps(prediction_event),
+                    PartitionKey=str(data_id),
+                )
+        except Exception as e:
+            print(f"Error processing record {sequence_number}:", str(e))
+            batch_item_failures.append({"itemIdentifier": sequence_number})
+            break
+
+        predictions.append(prediction_event)
+
+    return predictions, batch_item_failures
+
+
 # === Lambda Handler ===
 def lambda_handler(event, context):
-    predictions = []
+    print("Incoming event:", json.dumps(event)[:500])  # truncate long logs
+
+    # Case 1: Kinesis Event (partial batch response, never a whole-batch 500)
+    if "Records" in event:
+        predictions, batch_item_failures = handle_kinesis_batch(event["Records"])
+        return {
+            "statusCode": 200,
+            "predictions": predictions,
+            "batchItemFailures": batch_item_failures,
+        }
+
+    # Case 2: Direct Test Event
     try:
-        print("Incoming event:", json.dumps(event)[:500])  # truncate long logs
-
-        # Case 1: Kinesis Event
-        if "Records" in event:
-            for record in event["Records"]:
-                encoded_data = record["kinesis"]["data"]
-                decoded_data = base64.b64decode(encoded_data).decode("utf-8")
-                credit_pred_event = json.loads(decoded_data)
-
-                data = credit_pred_event["data"]
-                data_id = credit_pred_event.get("data_id", "N/A")
-
-                prob = predict(data)
-
-                prediction_event = {
-                    "model": "credit-default-risk-prediction",
-                    "version": "v1.0",
-                    "prediction": {
-                        "data_id": data_id,
-                        "default_probability": prob,
-                        "default_risk": "High" if prob >= 0.5 else "Low",
-                    },
-                }
-
-                if not TEST_RUN:
-                    kinesis_client.put_record(
-                        StreamName=PREDICTIONS_STREAM_NAME,
-                        Data=json.dumps(prediction_event),
-                        PartitionKey=str(data_id),
-                    )
-
-                predictions.append(prediction_event)
-
-        # Case 2: Direct Test Event
-        else:
-            features = event.get("data") or event.get("features") or event
-            if not isinstance(features, dict):
-                raise ValueError("Invalid input format. Must be a dict.")
-
-            data_id = event.get("data_id", "test-event")
-            prob = predict(features)
-
-            prediction_event = {
-                "model": "credit-default-risk-prediction",
-                "version": "v1.0",
-                "prediction": {
-                    "data_id": data_id,
-                    "default_probability": prob,
-                    "default_risk": "High" if prob >= 0.5 else "Low",
-                },
-            }
-            predictions.append(prediction_event)
+        features = event.get("data") or event.get("features") or event
+        if not isinstance(features, dict):
+            raise ValueError("Invalid input format. Must be a dict.")
+
+        data_id = event.get("data_id", "test-event")
+        prob = predict(prep_features(features))
 
         return {
             "statusCode": 200,
-            "predictions": predictions
+            "predictions": [build_prediction_event(data_id, prob)]
         }
 
     except Exception as e:
@@ -107,4 +197,4 @@ def lambda_handler(event, context):
         return {
             "statusCode": 500,
             "body": json.dumps({"error": str(e)})
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,142 @@
+import io
+import sys
+import json
+import types
+import base64
+import pickle
+
+import numpy as np
+import pytest
+import xgboost as xgb
+from sklearn.feature_extraction import DictVectorizer
+
+FEATURES = {
+    "AGE_GROUP": "Youth",
+    "YEARS_EMPLOYED_GROUP": "1-5 yrs",
+    "PHONE_CHANGE_GROUP": "moderate",
+    "REGION_RATING_CLIENT_W_CITY": 2,
+    "REGION_RATING_CLIENT": 1,
+    "EXT_SOURCE_3": 0.789,
+    "EXT_SOURCE_2": 0.621,
+    "EXT_SOURCE_1": 0.513,
+    "FLOORSMAX_AVG": 0.8,
+}
+
+
+def _bundle() -> bytes:
+    rng = np.random.default_rng(0)
+    rows = [
+        {**FEATURES, "AGE_GROUP": str(rng.choice(["Youth", "Adult", "Senior"])),
+         "EXT_SOURCE_3": float(rng.random()), "EXT_SOURCE_2": float(rng.random())}
+        for _ in range(200)
+    ]
+    dv = DictVectorizer()
+    X = dv.fit_transform(rows)
+    y = (X[:, dv.vocabulary_["EXT_SOURCE_3"]].toarray().ravel() > 0.5).astype(int)
+    booster = xgb.train({"objective": "binary:logistic"}, xgb.DMatrix(X, label=y), num_boost_round=5)
+    return pickle.dumps({"model": booster, "vectorizer": dv})
+
+
+class FakeClient:
+    def __init__(self, bundle: bytes):
+        self.bundle = bundle
+        self.put = []
+        self.put_error = None
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self.bundle)}
+
+    def put_record(self, **kwargs):
+        if self.put_error is not None:
+            raise self.put_error
+        self.put.append(kwargs)
+
+
+@pytest.fixture(scope="module")
+def lambda_function():
+    # The module loads its bundle from S3 at import; serve a synthetic one instead
+    client = FakeClient(_bundle())
+    saved = sys.modules.get("boto3")
+    sys.modules["boto3"] = types.SimpleNamespace(client=lambda *args, **kwargs: client)
+    try:
+        import lambda_function
+    finally:
+        if saved is None:
+            sys.modules.pop("boto3")
+        else:
+            sys.modules["boto3"] = saved
+    return lambda_function
+
+
+@pytest.fixture
+def kinesis(lambda_function, monkeypatch):
+    client = FakeClient(b"")
+    monkeypatch.setattr(lambda_function, "kinesis_client", client)
+    monkeypatch.setattr(lambda_function, "TEST_RUN", False)
+    return client
+
+
+def _record(seq: int, data, data_id=None) -> dict:
+    payload = data if isinstance(data, bytes) else json.dumps({"data": data, "data_id": data_id or seq}).encode()
+    return {"kinesis": {"sequenceNumber": str(seq), "data": base64.b64encode(payload).decode()}}
+
+
+def test_records_decode_to_coerced_model_features(lambda_function):
+    features, data_id = lambda_function.decode_record(
+        _record(1, {**FEATURES, "EXT_SOURCE_1": "0.25", "FLOORSMAX_AVG": None, "extra": [1, 2]}, 7)
+    )
+
+    assert data_id == 7
+    assert set(features) == set(FEATURES)
+    assert features["EXT_SOURCE_1"] == 0.25
+    assert features["FLOORSMAX_AVG"] == 0.0
+
+
+def test_unusable_feature_value_is_dead_lettered_not_retried(lambda_function, kinesis, monkeypatch, tmp_path):
+    dead_letter_path = tmp_path / "dead_letter.jsonl"
+    monkeypatch.setattr(lambda_function, "DEAD_LETTER_PATH", str(dead_letter_path))
+    records = [
+        _record(1, FEATURES),
+        _record(2, {**FEATURES, "EXT_SOURCE_3": [1, 2]}),
+        _record(3, {**FEATURES, "AGE_GROUP": {"a": 1}}),
+        _record(4, b"not json"),
+        _record(5, FEATURES),
+    ]
+
+    predictions, failures = lambda_function.handle_kinesis_batch(records)
+
+    assert failures == []
+    assert [p["prediction"]["data_id"] for p in predictions] == [1, 5]
+    assert len(kinesis.put) == 2
+    dead = [json.loads(line) for line in dead_letter_path.read_text().splitlines()]
+    assert [entry["sequenceNumber"] for entry in dead] == ["2", "3", "4"]
+    assert "EXT_SOURCE_3" in dead[0]["error"]
+
+
+def test_poison_record_without_dead_letter_path_stops_the_batch(lambda_function, kinesis, monkeypatch):
+    monkeypatch.setattr(lambda_function, "DEAD_LETTER_PATH", None)
+    records = [_record(1, FEATURES), _record(2, {**FEATURES, "EXT_SOURCE_2": "n/a"}), _record(3, FEATURES)]
+
+    predictions, failures = lambda_function.handle_kinesis_batch(records)
+
+    assert [p["prediction"]["data_id"] for p in predictions] == [1]
+    assert failures == [{"itemIdentifier": "2"}]
+
+
+def test_put_record_failure_is_transient_and_not_dead_lettered(lambda_function, kinesis, monkeypatch, tmp_path):
+    dead_letter_path = tmp_path / "dead_letter.jsonl"
+    monkeypatch.setattr(lambda_function, "DEAD_LETTER_PATH", str(dead_letter_path))
+    kinesis.put_error = ConnectionError("throttled")
+
+    predictions, failures = lambda_function.handle_kinesis_batch([_record(1, FEATURES), _record(2, FEATURES)])
+
+    assert predictions == []
+    assert failures == [{"itemIdentifier": "1"}]
+    assert not dead_letter_path.exists()
+
+
+def test_nan_numeric_scores_as_missing(lambda_function):
+    features, _ = lambda_function.decode_record(_record(1, b'{"data": {"EXT_SOURCE_3": NaN}, "data_id": 1}'))
+
+    assert np.isnan(features["EXT_SOURCE_3"])
+    assert 0.0 <= lambda_function.predict(features) <= 1.0
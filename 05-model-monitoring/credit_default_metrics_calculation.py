@@ -1,59 +1,63 @@
+import os
+import sys
 import time
 import random
 import logging
-import pandas as pd
+import resource
 import psycopg
 import joblib
 import numpy as np
 import pytz
 import xgboost as xgb
 from datetime import datetime
+from functools import lru_cache
+from types import SimpleNamespace
 from sklearn.metrics import roc_auc_score
 
 from evidently.report import Report
 from evidently import ColumnMapping
 from evidently.metrics import ColumnDriftMetric, DatasetDriftMetric, DatasetMissingValuesMetric
 
+from credit_default_metrics_rollup import prep_rollups, rebuild_rollups, refresh_rollups
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.normpath(os.path.join(BASE_DIR, "..")))
+
+from common.data_access import CAT_COLS, NUM_COLS, LazyParquet  # noqa: E402
+
 # --- Config ---
 SEND_TIMEOUT = 10
 DEFAULT_THRESHOLD = 0.5
+CHUNK_SIZE = 2000
 DB_CONN_STR = "host=localhost port=5432 user=postgres password=example"
 DB_NAME = "test"
 TABLE_NAME = "credit_default_prediction_metrics"
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s]: %(message)s")
+REFERENCE_PATH = os.path.join(BASE_DIR, "data/reference.parquet")
+MODEL_PATH = os.path.join(BASE_DIR, "models/xgb_cred_pred_ref.bin")
+X_VAL_PATH = os.path.normpath(os.path.join(BASE_DIR, "../processed_data/X_val.parquet"))
+Y_VAL_PATH = os.path.normpath(os.path.join(BASE_DIR, "../processed_data/y_val.txt"))
+
 rand = random.Random()
 
 # --- SQL schema ---
 create_table_statement = f"""
 drop table if exists {TABLE_NAME};
 create table {TABLE_NAME}(
+    id bigserial primary key,
     batch_id integer,
     prediction_drift float,
     num_drifted_columns integer,
     share_missing_values float,
     auc float,
     date_time_created timestamp
-)
+);
+create index {TABLE_NAME}_created_idx on {TABLE_NAME} (date_time_created);
 """
 
-# --- Load reference data ---
-reference_data = pd.read_parquet("data/reference.parquet")
-
-# --- Load model ---
-with open("models/xgb_cred_pred_ref.bin", "rb") as f_in:
-    dv, booster = joblib.load(f_in)
-
-# --- Load validation data ---
-X_val = pd.read_parquet("../processed_data/X_val.parquet")
-y_val = np.loadtxt("../processed_data/y_val.txt").astype(int)
-
-assert len(X_val) == len(y_val), "Mismatch between X_val and y_val"
-X_val["TARGET"] = y_val
-
 # --- Features ---
-num_features = X_val.select_dtypes(include=["int64", "float64"]).columns.tolist()
-cat_features = X_val.select_dtypes(include=["category", "object"]).columns.tolist()
+num_features = list(NUM_COLS)
+cat_features = list(CAT_COLS)
 
 column_mapping = ColumnMapping(
     prediction="PREDICTION",
@@ -62,6 +66,12 @@ column_mapping = ColumnMapping(
     target="TARGET"
 )
 
+# --- Data (read lazily, projected to the columns the report needs) ---
+reference_source = LazyParquet(
+    REFERENCE_PATH, columns=num_features + cat_features + ["TARGET", "PREDICTION_PROB", "PREDICTION"]
+)
+validation_source = LazyParquet(X_VAL_PATH, columns=num_features + cat_features)
+
 report = Report(metrics=[
     ColumnDriftMetric(column_name="PREDICTION"),
     DatasetDriftMetric(),
@@ -69,6 +79,35 @@ report = Report(metrics=[
 ])
 
 
+def predict_proba(dv, booster, data):
+    records = data[num_features + cat_features].to_dict(orient="records")
+    return booster.predict(xgb.DMatrix(dv.transform(records)))
+
+
+@lru_cache(maxsize=None)
+def load_resources(model_path: str = MODEL_PATH):
+    """
+    Loads the reference model and the reference dataset on first use.
+    Nothing touches disk at import time.
+    """
+    with open(model_path, "rb") as f_in:
+        dv, booster = joblib.load(f_in)
+
+    # Align the reference schema once instead of copying it per batch
+    reference_data = reference_source.frame
+    if "PREDICTION_PROB" not in reference_data.columns:
+        reference_data["PREDICTION_PROB"] = predict_proba(dv, booster, reference_data)
+    if "TARGET" not in reference_data.columns:
+        reference_data["TARGET"] = None
+
+    return SimpleNamespace(dv=dv, booster=booster, reference_data=reference_data)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (ru_maxrss is KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
 # --- Database setup ---
 def prep_db():
     with psycopg.connect(DB_CONN_STR, autocommit=True) as conn:
@@ -77,22 +116,23 @@ def prep_db():
             conn.execute(f"create database {DB_NAME};")
     with psycopg.connect(f"{DB_CONN_STR} dbname={DB_NAME}", autocommit=True) as conn:
         conn.execute(create_table_statement)
+        prep_rollups(conn)
+        # The source table was just recreated, so rollup sums and watermarks
+        # from a previous run would describe batches that no longer exist
+        rebuild_rollups(conn)
 
 
 # --- Metrics calculation ---
 def calculate_metrics_postgresql(curr, batch_id, current_data, threshold=DEFAULT_THRESHOLD):
+    resources = load_resources()
+
     # Handle missing values
     current_data[num_features] = current_data[num_features].fillna(0)
     for col in cat_features:
         current_data[col] = current_data[col].astype(str).fillna("missing")
 
-    # Transform
-    records = current_data[num_features + cat_features].to_dict(orient="records")
-    X_transformed = dv.transform(records)
-
     # Predict
-    dmat = xgb.DMatrix(X_transformed)
-    proba = booster.predict(dmat)
+    proba = predict_proba(resources.dv, resources.booster, current_data)
 
     # Predictions
     current_data["PREDICTION_PROB"] = proba
@@ -106,18 +146,8 @@ def calculate_metrics_postgresql(curr, batch_id, current_data, threshold=DEFAULT
         except ValueError:
             auc = None
 
-    # Ensure reference_data has aligned schema
-    reference_aligned = reference_data.copy()
-    if "PREDICTION_PROB" not in reference_aligned.columns:
-        ref_records = reference_aligned[num_features + cat_features].to_dict(orient="records")
-        X_ref = dv.transform(ref_records)
-        ref_proba = booster.predict(xgb.DMatrix(X_ref))
-        reference_aligned["PREDICTION_PROB"] = ref_proba
-    if "TARGET" not in reference_aligned.columns:
-        reference_aligned["TARGET"] = None
-
     # Run Evidently report
-    report.run(reference_data=reference_aligned, current_data=current_data, column_mapping=column_mapping)
+    report.run(reference_data=resources.reference_data, current_data=current_data, column_mapping=column_mapping)
     result = report.as_dict()
 
     prediction_drift = result["metrics"][0]["result"]["drift_score"]
@@ -145,11 +175,17 @@ def batch_monitoring_backfill():
     prep_db()
     last_send = time.time() - SEND_TIMEOUT
 
-    chunk_size = 2000
+    y_val = np.loadtxt(Y_VAL_PATH).astype(int)
+    offset = 0
+
     with psycopg.connect(f"{DB_CONN_STR} dbname={DB_NAME}", autocommit=True) as conn:
-        for batch_id, start_idx in enumerate(range(0, len(X_val), chunk_size)):
-            end_idx = start_idx + chunk_size
-            current_data = X_val.iloc[start_idx:end_idx].copy()
+        # Stream X_val in row batches instead of holding the whole frame
+        for batch_id, current_data in enumerate(validation_source.iter_frames(CHUNK_SIZE)):
+            current_data = current_data.copy()
+            end = offset + len(current_data)
+            assert end <= len(y_val), "Mismatch between X_val and y_val"
+            current_data["TARGET"] = y_val[offset:end]
+            offset = end
 
             with conn.cursor() as curr:
                 try:
@@ -158,6 +194,9 @@ def batch_monitoring_backfill():
                     logging.error("Failed to process batch %s: %s", batch_id, str(e))
                     continue
 
+            # fold the new batch into the hourly/daily rollups read by Grafana
+            refresh_rollups(conn)
+
             # pacing
             new_send = time.time()
             seconds_elapsed = new_send - last_send
@@ -165,6 +204,10 @@ def batch_monitoring_backfill():
                 time.sleep(SEND_TIMEOUT - seconds_elapsed)
             last_send = new_send
 
+    assert offset == len(y_val), "Mismatch between X_val and y_val"
+    logging.info("Backfill finished | peak RSS %.1f MB", peak_rss_mb())
+
 
 if __name__ == "__main__":
-    batch_monitoring_backfill()
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s]: %(message)s")
+    batch_monitoring_backfill()
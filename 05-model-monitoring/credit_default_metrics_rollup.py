@@ -0,0 +1,211 @@
+import time
+import logging
+import argparse
+import psycopg
+
+# --- Config ---
+DB_CONN_STR = "host=localhost port=5432 user=postgres password=example"
+DB_NAME = "test"
+SOURCE_TABLE = "credit_default_prediction_metrics"
+STATE_TABLE = "credit_default_prediction_metrics_rollup_state"
+DEFAULT_INTERVAL = 60
+
+# rollup table name -> date_trunc() precision
+ROLLUPS = {
+    "credit_default_prediction_metrics_hourly": "hour",
+    "credit_default_prediction_metrics_daily": "day",
+}
+
+# --- SQL schema ---
+# Rollups keep sums and counts rather than averages so new batches can be
+# folded into an existing bucket without re-reading the batches already in it.
+create_rollup_statement = """
+create table if not exists {table}(
+    bucket timestamp primary key,
+    num_batches integer not null,
+    prediction_drift_sum float,
+    prediction_drift_count integer not null,
+    prediction_drift_max float,
+    num_drifted_columns_sum bigint,
+    num_drifted_columns_max integer,
+    share_missing_values_sum float,
+    share_missing_values_count integer not null,
+    auc_sum float,
+    auc_count integer not null,
+    auc_min float,
+    last_batch_created timestamp
+);
+create or replace view {table}_view as
+select
+    bucket,
+    num_batches,
+    prediction_drift_sum / nullif(prediction_drift_count, 0) as prediction_drift,
+    prediction_drift_max,
+    num_drifted_columns_sum::float / nullif(num_batches, 0) as num_drifted_columns,
+    num_drifted_columns_max,
+    share_missing_values_sum / nullif(share_missing_values_count, 0) as share_missing_values,
+    auc_sum / nullif(auc_count, 0) as auc,
+    auc_min
+from {table};
+"""
+
+# Watermarks are on the source table's serial id, not date_time_created: a
+# batch committed late with an earlier timestamp would fall below a
+# timestamp watermark and never be rolled up.
+create_state_statement = f"""
+create table if not exists {STATE_TABLE}(
+    rollup_name varchar primary key,
+    last_id bigint not null
+);
+"""
+
+# Source tables created before the serial id get one (existing rows are numbered in storage order)
+create_source_index_statement = f"""
+alter table {SOURCE_TABLE} add column if not exists id bigserial primary key;
+create index if not exists {SOURCE_TABLE}_created_idx on {SOURCE_TABLE} (date_time_created);
+"""
+
+upsert_rollup_statement = """
+insert into {table}
+select
+    date_trunc('{precision}', date_time_created) as bucket,
+    count(*),
+    sum(prediction_drift),
+    count(prediction_drift),
+    max(prediction_drift),
+    sum(num_drifted_columns),
+    max(num_drifted_columns),
+    sum(share_missing_values),
+    count(share_missing_values),
+    sum(auc),
+    count(auc),
+    min(auc),
+    max(date_time_created)
+from {source}
+where id > %s and id <= %s
+group by 1
+on conflict (bucket) do update set
+    num_batches = {table}.num_batches + excluded.num_batches,
+    prediction_drift_sum = coalesce({table}.prediction_drift_sum, 0) + coalesce(excluded.prediction_drift_sum, 0),
+    prediction_drift_count = {table}.prediction_drift_count + excluded.prediction_drift_count,
+    prediction_drift_max = greatest({table}.prediction_drift_max, excluded.prediction_drift_max),
+    num_drifted_columns_sum = coalesce({table}.num_drifted_columns_sum, 0) + coalesce(excluded.num_drifted_columns_sum, 0),
+    num_drifted_columns_max = greatest({table}.num_drifted_columns_max, excluded.num_drifted_columns_max),
+    share_missing_values_sum = coalesce({table}.share_missing_values_sum, 0) + coalesce(excluded.share_missing_values_sum, 0),
+    share_missing_values_count = {table}.share_missing_values_count + excluded.share_missing_values_count,
+    auc_sum = coalesce({table}.auc_sum, 0) + coalesce(excluded.auc_sum, 0),
+    auc_count = {table}.auc_count + excluded.auc_count,
+    auc_min = least({table}.auc_min, excluded.auc_min),
+    last_batch_created = greatest({table}.last_batch_created, excluded.last_batch_created)
+"""
+
+
+# --- Database setup ---
+def source_exists(conn) -> bool:
+    return conn.execute("SELECT to_regclass(%s)", (SOURCE_TABLE,)).fetchone()[0] is not None
+
+
+def prep_rollups(conn):
+    """
+    Creates the rollup and state tables, and the source table's id and
+    index once it exists (the monitoring job creates it). A state table
+    with timestamp watermarks is dropped together with the rollup rows,
+    so the next refresh rebuilds them on ids.
+    """
+    if source_exists(conn):
+        conn.execute(create_source_index_statement)
+    stale_state = conn.execute(
+        "SELECT 1 FROM information_schema.columns WHERE table_name = %s AND column_name = 'last_processed'",
+        (STATE_TABLE,)
+    ).fetchone()
+    if stale_state:
+        logging.warning("Rollup state has timestamp watermarks; rebuilding rollups on ids")
+        conn.execute(f"DROP TABLE {STATE_TABLE}")
+    conn.execute(create_state_statement)
+    for table in ROLLUPS:
+        conn.execute(create_rollup_statement.format(table=table))
+    if stale_state:
+        rebuild_rollups(conn)
+
+
+# --- Incremental refresh ---
+def refresh_rollups(conn):
+    """
+    Folds batches inserted since the last refresh into every rollup table.
+    Each rollup keeps its own id watermark. The high watermark, the upsert
+    and the watermark move share one repeatable-read transaction, so an
+    interrupted refresh never double-counts a batch and a batch visible to
+    the upsert is never skipped. Ids follow commit order as long as one
+    writer inserts at a time, as the monitoring job does.
+    Returns the number of new batches seen.
+    """
+    if not source_exists(conn):
+        return 0
+
+    new_batches = 0
+    for table, precision in ROLLUPS.items():
+        with conn.transaction():
+            conn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            high_water = conn.execute(f"SELECT max(id) FROM {SOURCE_TABLE}").fetchone()[0]
+            row = conn.execute(
+                f"SELECT last_id FROM {STATE_TABLE} WHERE rollup_name = %s FOR UPDATE",
+                (table,)
+            ).fetchone()
+            low_water = row[0] if row else 0
+            if high_water is None or low_water >= high_water:
+                continue
+
+            count = conn.execute(
+                f"SELECT count(*) FROM {SOURCE_TABLE} WHERE id > %s AND id <= %s",
+                (low_water, high_water)
+            ).fetchone()[0]
+            conn.execute(
+                upsert_rollup_statement.format(table=table, precision=precision, source=SOURCE_TABLE),
+                (low_water, high_water)
+            )
+            conn.execute(
+                f"""
+                INSERT INTO {STATE_TABLE} (rollup_name, last_id) VALUES (%s, %s)
+                ON CONFLICT (rollup_name) DO UPDATE SET last_id = excluded.last_id
+                """,
+                (table, high_water)
+            )
+            new_batches = max(new_batches, count)
+
+    return new_batches
+
+
+def rebuild_rollups(conn):
+    """Drops all rollup rows and watermarks so the next refresh starts from scratch."""
+    with conn.transaction():
+        for table in ROLLUPS:
+            conn.execute(f"TRUNCATE {table}")
+        conn.execute(f"TRUNCATE {STATE_TABLE}")
+
+
+# --- Rollup loop ---
+def run(interval=None, rebuild=False):
+    with psycopg.connect(f"{DB_CONN_STR} dbname={DB_NAME}", autocommit=True) as conn:
+        prep_rollups(conn)
+        if rebuild:
+            rebuild_rollups(conn)
+
+        while True:
+            start = time.perf_counter()
+            new_batches = refresh_rollups(conn)
+            logging.info(
+                "Rolled up %s new batches in %.3fs", new_batches, time.perf_counter() - start
+            )
+            if interval is None:
+                break
+            time.sleep(interval)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s]: %(message)s")
+    parser = argparse.ArgumentParser(description="Refresh hourly/daily rollups of the drift metrics table.")
+    parser.add_argument("--interval", type=int, default=None,
+                        help=f"keep refreshing every N seconds (e.g. {DEFAULT_INTERVAL}) instead of once")
+    parser.add_argument("--rebuild", action="store_true", help="recompute rollups from the full metrics table")
+    args = parser.parse_args()
+    run(interval=args.interval, rebuild=args.rebuild)
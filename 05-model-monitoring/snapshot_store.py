@@ -0,0 +1,318 @@
+import os
+import json
+import glob
+import uuid
+import shutil
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# --- Config ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKSPACE_DIR = os.path.join(BASE_DIR, "workspace")
+STORE_DIR = os.path.join(BASE_DIR, "snapshot_store")
+COMPRESSION = "zstd"
+COMPACTED_NAME = "compacted.parquet"
+# Parquet key-value metadata of the compacted file: the segments merged into it
+REPLACES_KEY = b"snapshot_store.replaces"
+ROW_GROUP_SIZE = 64 * 1024
+
+# Result sections that only feed Evidently's UI plots
+SKIPPED_FIELDS = {"type", "plot_data"}
+
+SNAPSHOT_SCHEMA = pa.schema([
+    ("snapshot_id", pa.string()),
+    ("timestamp", pa.timestamp("us")),
+    ("payload", pa.binary()),
+])
+
+METRIC_SCHEMA = pa.schema([
+    ("snapshot_id", pa.string()),
+    ("timestamp", pa.timestamp("us")),
+    ("metric_id", pa.string()),
+    ("column_name", pa.string()),
+    ("field_path", pa.string()),
+    ("value", pa.float64()),
+])
+
+
+def _metric_id(metric: dict) -> str:
+    return metric["type"].rsplit(":", 1)[-1]
+
+
+def _column_name(metric: dict):
+    column = metric.get("column_name")
+    if isinstance(column, dict):
+        return column.get("name")
+    return column
+
+
+def _numeric_leaves(obj, prefix=""):
+    """Yields (dotted path, value) for every numeric leaf of a metric result."""
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            if key in SKIPPED_FIELDS:
+                continue
+            yield from _numeric_leaves(value, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(obj, bool):
+        yield prefix, float(obj)
+    elif isinstance(obj, (int, float)):
+        yield prefix, float(obj)
+
+
+def extract_metrics(snapshot: dict):
+    """Flattens a snapshot into rows for the metric index."""
+    suite = snapshot.get("suite", {})
+    timestamp = datetime.fromisoformat(snapshot["timestamp"])
+    rows = []
+    for metric, result in zip(suite.get("metrics", []), suite.get("metric_results", [])):
+        metric_id = _metric_id(metric)
+        column_name = _column_name(metric)
+        for field_path, value in _numeric_leaves(result):
+            rows.append({
+                "snapshot_id": snapshot["id"],
+                "timestamp": timestamp,
+                "metric_id": metric_id,
+                "column_name": column_name,
+                "field_path": field_path,
+                "value": value,
+            })
+    return rows
+
+
+class SnapshotStore:
+    """
+    Append-only, per-project store for Evidently snapshots.
+
+    Each project directory holds the project's `metadata.json` and two
+    Parquet datasets:
+      - snapshots/: the full snapshot JSON, zstd-compressed, one row per run
+      - metrics/:   one row per numeric metric value, sorted by
+                    (metric_id, column_name, field_path, timestamp)
+    Appends write small segment files; `compact` merges them into a single
+    file per dataset and applies the retention policy. The compacted file
+    lists the segments it replaces, and reads skip those, so a compaction
+    interrupted before it removed them never returns duplicate rows.
+    """
+
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+
+    # --- Layout ---
+    def project_dir(self, project_id: str) -> str:
+        return os.path.join(self.root, project_id)
+
+    def _dataset_dir(self, project_id: str, name: str) -> str:
+        return os.path.join(self.project_dir(project_id), name)
+
+    def _files(self, project_id: str, name: str):
+        """Dataset files to read: the compacted file and the segments not merged into it yet."""
+        files = sorted(glob.glob(os.path.join(self._dataset_dir(project_id, name), "*.parquet")))
+        replaced = self._replaced(project_id, name)
+        return [path for path in files if os.path.basename(path) not in replaced]
+
+    def _replaced(self, project_id: str, name: str) -> set:
+        path = os.path.join(self._dataset_dir(project_id, name), COMPACTED_NAME)
+        if not os.path.exists(path):
+            return set()
+        metadata = pq.read_schema(path).metadata or {}
+        return set(json.loads(metadata.get(REPLACES_KEY, b"[]")))
+
+    def list_projects(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            d for d in os.listdir(self.root)
+            if os.path.isfile(os.path.join(self.root, d, "metadata.json"))
+        )
+
+    def load_metadata(self, project_id: str) -> dict:
+        with open(os.path.join(self.project_dir(project_id), "metadata.json")) as f_in:
+            return json.load(f_in)
+
+    def save_metadata(self, project_id: str, metadata: dict):
+        os.makedirs(self.project_dir(project_id), exist_ok=True)
+        with open(os.path.join(self.project_dir(project_id), "metadata.json"), "w") as f_out:
+            json.dump(metadata, f_out, indent=2)
+
+    # --- Writes ---
+    def append(self, project_id: str, snapshots):
+        """Appends one or more snapshot dicts as a new segment."""
+        if isinstance(snapshots, dict):
+            snapshots = [snapshots]
+        if not snapshots:
+            return
+
+        snapshot_rows = [{
+            "snapshot_id": s["id"],
+            "timestamp": datetime.fromisoformat(s["timestamp"]),
+            "payload": json.dumps(s, separators=(",", ":")).encode("utf-8"),
+        } for s in snapshots]
+        metric_rows = [row for s in snapshots for row in extract_metrics(s)]
+
+        segment = f"part-{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{uuid.uuid4().hex[:8]}.parquet"
+        self._write(project_id, "snapshots", segment, pa.Table.from_pylist(snapshot_rows, schema=SNAPSHOT_SCHEMA))
+        self._write(project_id, "metrics", segment, pa.Table.from_pylist(metric_rows, schema=METRIC_SCHEMA))
+
+    def _write(self, project_id: str, name: str, filename: str, table: pa.Table):
+        directory = self._dataset_dir(project_id, name)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, f".{filename}.tmp")
+        pq.write_table(table, tmp_path, compression=COMPRESSION, row_group_size=ROW_GROUP_SIZE)
+        os.replace(tmp_path, os.path.join(directory, filename))
+
+    # --- Reads ---
+    def _read(self, project_id: str, name: str, schema: pa.Schema, columns=None, filters=None) -> pa.Table:
+        files = self._files(project_id, name)
+        if not files:
+            return schema.empty_table().select(columns or schema.names)
+        return pq.read_table(files, schema=schema, columns=columns, filters=filters)
+
+    def metric_series(self, project_id: str, metric_id: str, field_path: str, column_name=None,
+                      start=None, end=None):
+        """
+        Returns a (timestamp, value) Arrow table for one metric field.
+        Only the metric index is read; snapshot payloads are never decoded.
+        """
+        filters = [("metric_id", "=", metric_id), ("field_path", "=", field_path)]
+        if column_name is not None:
+            filters.append(("column_name", "=", column_name))
+        if start is not None:
+            filters.append(("timestamp", ">=", start))
+        if end is not None:
+            filters.append(("timestamp", "<", end))
+
+        table = self._read(project_id, "metrics", METRIC_SCHEMA, columns=["timestamp", "value"], filters=filters)
+        return table.sort_by("timestamp")
+
+    def list_snapshots(self, project_id: str, start=None, end=None) -> pa.Table:
+        filters = []
+        if start is not None:
+            filters.append(("timestamp", ">=", start))
+        if end is not None:
+            filters.append(("timestamp", "<", end))
+        table = self._read(project_id, "snapshots", SNAPSHOT_SCHEMA,
+                           columns=["snapshot_id", "timestamp"], filters=filters or None)
+        return table.sort_by("timestamp")
+
+    def load_snapshot(self, project_id: str, snapshot_id: str) -> dict:
+        table = self._read(project_id, "snapshots", SNAPSHOT_SCHEMA, columns=["payload"],
+                           filters=[("snapshot_id", "=", snapshot_id)])
+        if table.num_rows == 0:
+            raise KeyError(f"Snapshot {snapshot_id} not found in project {project_id}")
+        return json.loads(table.column("payload")[0].as_py())
+
+    # --- Maintenance ---
+    def compact(self, project_id: str, retention_days=None, now=None):
+        """
+        Merges all segments of a project into one file per dataset, sorted
+        for predicate pushdown, and drops snapshots older than
+        `retention_days` (metric index rows included).
+        Returns the number of snapshots kept.
+        """
+        cutoff = None
+        if retention_days is not None:
+            cutoff = (now or datetime.now()) - timedelta(days=retention_days)
+
+        kept = 0
+        for name, schema, sort_keys in (
+            ("snapshots", SNAPSHOT_SCHEMA, ["timestamp"]),
+            ("metrics", METRIC_SCHEMA, ["metric_id", "column_name", "field_path", "timestamp"]),
+        ):
+            files = self._files(project_id, name)
+            if not files:
+                continue
+            # Leftovers of an interrupted compaction stay listed until they are removed
+            replaces = sorted(
+                ({os.path.basename(path) for path in files} - {COMPACTED_NAME}) | self._replaced(project_id, name)
+            )
+            table = pq.read_table(files, schema=schema)
+            if cutoff is not None:
+                table = table.filter(pc.field("timestamp") >= pa.scalar(cutoff, pa.timestamp("us")))
+            table = table.sort_by([(key, "ascending") for key in sort_keys])
+            if name == "snapshots":
+                kept = table.num_rows
+
+            # The segments are only removed once the file replacing them is in place
+            table = table.replace_schema_metadata({REPLACES_KEY: json.dumps(replaces).encode("utf-8")})
+            self._write(project_id, name, COMPACTED_NAME, table)
+            for segment in replaces:
+                path = os.path.join(self._dataset_dir(project_id, name), segment)
+                if os.path.exists(path):
+                    os.remove(path)
+        return kept
+
+    def import_workspace(self, workspace_dir: str = WORKSPACE_DIR):
+        """
+        Imports an Evidently file workspace (one directory per project with
+        metadata.json and snapshots/*.json). Already imported snapshots are
+        skipped, so the import can be re-run.
+        Returns {project_id: number of snapshots imported}.
+        """
+        imported = {}
+        for metadata_path in sorted(glob.glob(os.path.join(workspace_dir, "*", "metadata.json"))):
+            project_dir = os.path.dirname(metadata_path)
+            with open(metadata_path) as f_in:
+                metadata = json.load(f_in)
+            project_id = metadata.get("id") or os.path.basename(project_dir)
+            self.save_metadata(project_id, metadata)
+
+            existing = set(self.list_snapshots(project_id).column("snapshot_id").to_pylist())
+            snapshots = []
+            for snapshot_path in sorted(glob.glob(os.path.join(project_dir, "snapshots", "*.json"))):
+                with open(snapshot_path) as f_in:
+                    snapshot = json.load(f_in)
+                if snapshot["id"] not in existing:
+                    snapshots.append(snapshot)
+
+            self.append(project_id, snapshots)
+            imported[project_id] = len(snapshots)
+        return imported
+
+    def drop_project(self, project_id: str):
+        shutil.rmtree(self.project_dir(project_id), ignore_errors=True)
+
+
+# --- CLI ---
+def main():
+    parser = argparse.ArgumentParser(description="Compact, indexed store for Evidently snapshots.")
+    parser.add_argument("--store", default=STORE_DIR, help="store root directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = sub.add_parser("import", help="import an Evidently file workspace")
+    import_parser.add_argument("--workspace", default=WORKSPACE_DIR)
+
+    compact_parser = sub.add_parser("compact", help="merge segments and apply retention")
+    compact_parser.add_argument("--project", default=None, help="project id (default: all projects)")
+    compact_parser.add_argument("--retention-days", type=int, default=None)
+
+    series_parser = sub.add_parser("series", help="print a metric time series")
+    series_parser.add_argument("--project", required=True)
+    series_parser.add_argument("--metric", required=True, help="e.g. DatasetSummaryMetric")
+    series_parser.add_argument("--field", required=True, help="e.g. current.number_of_rows")
+    series_parser.add_argument("--column", default=None)
+
+    args = parser.parse_args()
+    store = SnapshotStore(args.store)
+
+    if args.command == "import":
+        for project_id, count in store.import_workspace(args.workspace).items():
+            logging.info("Imported %s snapshots into project %s", count, project_id)
+    elif args.command == "compact":
+        projects = [args.project] if args.project else store.list_projects()
+        for project_id in projects:
+            kept = store.compact(project_id, retention_days=args.retention_days)
+            logging.info("Compacted project %s | %s snapshots kept", project_id, kept)
+    elif args.command == "series":
+        series = store.metric_series(args.project, args.metric, args.field, column_name=args.column)
+        for timestamp, value in zip(series.column("timestamp").to_pylist(), series.column("value").to_pylist()):
+            print(f"{timestamp.isoformat()}\t{value}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s]: %(message)s")
+    main()
@@ -0,0 +1,22 @@
+import sys
+import importlib
+
+import pyarrow.parquet as pq
+
+
+def _fail(*args, **kwargs):
+    raise AssertionError("disk read at import time")
+
+
+def test_import_has_no_side_effects(monkeypatch, tmp_path):
+    # Relative paths would break from another cwd, and no data may be read
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(pq, "read_table", _fail)
+    monkeypatch.setattr(pq, "ParquetFile", _fail)
+    sys.modules.pop("credit_default_metrics_calculation", None)
+
+    module = importlib.import_module("credit_default_metrics_calculation")
+
+    assert not module.reference_source.loaded
+    assert module.load_resources.cache_info().currsize == 0
+    assert module.num_features == module.NUM_COLS
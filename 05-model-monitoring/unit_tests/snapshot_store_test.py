@@ -0,0 +1,98 @@
+import os
+import glob
+import json
+from datetime import datetime
+
+import pytest
+
+from snapshot_store import SnapshotStore
+
+WORKSPACE_DIR = os.path.join(os.path.dirname(__file__), "../workspace")
+
+
+def _snapshot(snapshot_id, timestamp, rows):
+    return {
+        "id": snapshot_id,
+        "timestamp": timestamp,
+        "suite": {
+            "metrics": [{"type": "evidently:metric:DatasetSummaryMetric"}],
+            "metric_results": [{
+                "type": "evidently:metric_result:DatasetSummaryMetricResult",
+                "current": {"number_of_rows": rows, "prediction": "prediction"},
+                "plot_data": {"values": [1, 2, 3]},
+            }],
+        },
+    }
+
+
+def test_import_workspace_and_read_series(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+
+    imported = store.import_workspace(WORKSPACE_DIR)
+
+    assert sum(imported.values()) == len(glob.glob(os.path.join(WORKSPACE_DIR, "*/snapshots/*.json")))
+    for project_id in imported:
+        series = store.metric_series(project_id, "DatasetSummaryMetric", "current.number_of_rows")
+        assert series.column("value").to_pylist() == [2000.0]
+
+        missing = store.metric_series(project_id, "ColumnSummaryMetric", "current_characteristics.missing",
+                                      column_name="EXT_SOURCE_3")
+        assert missing.num_rows == 1
+
+    # Re-running the import does not duplicate snapshots
+    assert sum(store.import_workspace(WORKSPACE_DIR).values()) == 0
+
+
+def test_round_trip_snapshot(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    snapshot_path = sorted(glob.glob(os.path.join(WORKSPACE_DIR, "*/snapshots/*.json")))[0]
+    with open(snapshot_path) as f_in:
+        snapshot = json.load(f_in)
+
+    store.append("project", snapshot)
+
+    assert store.load_snapshot("project", snapshot["id"]) == snapshot
+
+
+def test_compact_merges_segments_and_applies_retention(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.append("project", _snapshot("old", "2025-01-01T00:00:00", 100))
+    store.append("project", _snapshot("mid", "2025-03-01T00:00:00", 200))
+    store.append("project", _snapshot("new", "2025-03-10T00:00:00", 300))
+    assert len(glob.glob(os.path.join(str(tmp_path), "project", "snapshots", "*.parquet"))) == 3
+
+    kept = store.compact("project", retention_days=30, now=datetime(2025, 3, 15))
+
+    assert kept == 2
+    assert len(glob.glob(os.path.join(str(tmp_path), "project", "snapshots", "*.parquet"))) == 1
+    series = store.metric_series("project", "DatasetSummaryMetric", "current.number_of_rows")
+    assert series.column("value").to_pylist() == [200.0, 300.0]
+    assert store.metric_series("project", "DatasetSummaryMetric", "plot_data.values").num_rows == 0
+
+
+def test_compaction_interrupted_before_removing_segments_reads_no_duplicates(tmp_path, monkeypatch):
+    store = SnapshotStore(str(tmp_path))
+    store.append("project", _snapshot("a", "2025-03-01T00:00:00", 100))
+    store.append("project", _snapshot("b", "2025-03-02T00:00:00", 200))
+    store.compact("project")
+    store.append("project", _snapshot("c", "2025-03-03T00:00:00", 300))
+
+    def crash(path):
+        raise OSError("crashed")
+
+    with monkeypatch.context() as m:
+        m.setattr(os, "remove", crash)
+        with pytest.raises(OSError):
+            store.compact("project")
+
+    # Segment "c" is still on disk next to the compacted file that includes it
+    assert len(glob.glob(os.path.join(str(tmp_path), "project", "snapshots", "*.parquet"))) == 2
+    series = store.metric_series("project", "DatasetSummaryMetric", "current.number_of_rows")
+    assert series.column("value").to_pylist() == [100.0, 200.0, 300.0]
+    assert store.list_snapshots("project").column("snapshot_id").to_pylist() == ["a", "b", "c"]
+
+    store.append("project", _snapshot("d", "2025-03-04T00:00:00", 400))
+    assert store.compact("project") == 4
+    assert len(glob.glob(os.path.join(str(tmp_path), "project", "metrics", "*.parquet"))) == 1
+    series = store.metric_series("project", "DatasetSummaryMetric", "current.number_of_rows")
+    assert series.column("value").to_pylist() == [100.0, 200.0, 300.0, 400.0]
@@ -0,0 +1,56 @@
+"""
+Lambda init duration of the serving image, measured as fresh interpreters
+running `import lambda_function` with INIT_REPORT=true and LOCAL=true.
+Run it with the image's interpreter/site-packages (e.g. a venv built from
+requirements.txt) to see what the Lambda init phase pays.
+
+    python benchmarks/cold_start.py --bundle xgb_credit_pred.serving.zip --runs 10
+"""
+import os
+import re
+import sys
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVING_DIR = os.path.normpath(os.path.join(BASE_DIR, ".."))
+INIT_LINE = re.compile(r"Init (\d+)ms \| imports (\d+)ms")
+
+
+def cold_start(python: str, workdir: str):
+    env = dict(os.environ, LOCAL="true", INIT_REPORT="true", RUN_ID="cold-start",
+               PYTHONPATH=SERVING_DIR, PYTHONDONTWRITEBYTECODE="1")
+    output = subprocess.run(
+        [python, "-c", "import lambda_function"], cwd=workdir, env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    init_ms, imports_ms = map(float, INIT_LINE.search(output).groups())
+    return init_ms, imports_ms, output
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bundle", required=True, help="pickled or serving model bundle")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--python", default=sys.executable, help="interpreter of the serving environment")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # load_model(local=True) reads integration_test/model/xgb_credit_pred.serving.zip from the cwd
+        model_dir = os.path.join(workdir, "integration_test", "model")
+        os.makedirs(model_dir)
+        shutil.copy(args.bundle, os.path.join(model_dir, "xgb_credit_pred.serving.zip"))
+
+        cold_start(args.python, workdir)  # warm the OS page cache
+        runs = [cold_start(args.python, workdir) for _ in range(args.runs)]
+
+    print(runs[-1][2])
+    print(f"init p50={statistics.median(r[0] for r in runs):.0f}ms "
+          f"(imports p50={statistics.median(r[1] for r in runs):.0f}ms) over {args.runs} runs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Records/s for the decode + encode step of a Kinesis batch, before any
+scoring: the original path (stdlib json -> feature dicts ->
+DictVectorizer.transform) against the batch decoder on JSON and on
+packed binary records.
+
+    python benchmarks/decode_throughput.py --batch-size 100 --batches 300
+"""
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+
+import pandas as pd
+from sklearn.feature_extraction import DictVectorizer
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, ".."))
+
+import model  # noqa: E402
+from shadow_latency import X_VAL_PATH  # noqa: E402
+
+
+def make_batches(records, batch_size, batches, packed):
+    events = []
+    for b in range(batches):
+        chunk = [records[(b * batch_size + i) % len(records)] for i in range(batch_size)]
+        events.append({"Records": [
+            {"kinesis": {
+                "data": base64.b64encode(model.encode_record(r, b * batch_size + i, packed=packed)).decode("utf-8"),
+                "sequenceNumber": str(b * batch_size + i),
+            }}
+            for i, r in enumerate(chunk)
+        ]})
+    return events
+
+
+def baseline_decode(model_service, event):
+    features_list = []
+    for record in event["Records"]:
+        data_event = json.loads(base64.b64decode(record["kinesis"]["data"]).decode("utf-8"))
+        features_list.append(model.prep_features(data_event["data"]))
+    return model_service.dv.transform(features_list)
+
+
+def batch_decode(model_service, event):
+    batch, _, _ = model_service.decode_records(event["Records"])
+    return model_service.bundle.encoder.transform(batch)
+
+
+def throughput(decode, model_service, events):
+    start = time.perf_counter()
+    n = 0
+    for event in events:
+        decode(model_service, event)
+        n += len(event["Records"])
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--batches", type=int, default=300)
+    args = parser.parse_args()
+
+    df = pd.read_parquet(X_VAL_PATH)
+    records = [model.prep_features(r) for r in df.astype({c: str for c in model.cat_cols}).to_dict(orient="records")]
+    dv = DictVectorizer().fit(records)
+    model_service = model.ModelService(None, dv)
+
+    json_events = make_batches(records, args.batch_size, args.batches, packed=False)
+    packed_events = make_batches(records, args.batch_size, args.batches, packed=True)
+    json_size = sum(len(r["kinesis"]["data"]) for e in json_events for r in e["Records"]) / (args.batch_size * args.batches)
+    packed_size = sum(len(r["kinesis"]["data"]) for e in packed_events for r in e["Records"]) / (args.batch_size * args.batches)
+
+    print(f"JSON parser: {'orjson' if 'orjson' in sys.modules else 'json'}")
+    baseline = throughput(baseline_decode, model_service, json_events)
+    print(f"{'json + DictVectorizer':>24}: {baseline:>9.0f} rec/s | {json_size:.0f} b64 bytes/record")
+    for name, events, size in (("json + batch decoder", json_events, json_size),
+                               ("packed + batch decoder", packed_events, packed_size)):
+        rate = throughput(batch_decode, model_service, events)
+        print(f"{name:>24}: {rate:>9.0f} rec/s ({rate / baseline:.1f}x) | {size:.0f} b64 bytes/record")
+
+
+if __name__ == "__main__":
+    main()
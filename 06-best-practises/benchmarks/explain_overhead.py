@@ -0,0 +1,57 @@
+"""
+Per-batch latency of reason codes on top of plain scoring, for exact
+(TreeSHAP) and approximate (Saabas) contributions, with a cold and a warm
+contribution cache.
+
+    python benchmarks/explain_overhead.py --batch-size 100 --batches 300
+"""
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction import DictVectorizer
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, ".."))
+
+import model  # noqa: E402
+from shadow_latency import X_VAL_PATH, Y_VAL_PATH, train_bundle, make_events, run  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--batches", type=int, default=300)
+    args = parser.parse_args()
+
+    df = pd.read_parquet(X_VAL_PATH)
+    y = np.loadtxt(Y_VAL_PATH).astype(int)
+    records = [model.prep_features(r) for r in df.astype({c: str for c in model.cat_cols}).to_dict(orient="records")]
+
+    dv = DictVectorizer()
+    X = dv.fit_transform(records)
+    booster = train_bundle(X, y, 200, 0)
+    events = make_events(records, args.batch_size, args.batches)
+
+    baseline = run(model.ModelService(booster, dv), events)["p50_ms"]
+    print(f"{'no explanations':>22}: p50={baseline:.2f}ms")
+    for approximate in (False, True):
+        explainer = model.ReasonCodeExplainer(top_k=3, approximate=approximate, cache_size=0)
+        cold = run(model.ModelService(booster, dv, explainer=explainer), events)["p50_ms"]
+
+        step = explainer.latency.percentile(50)
+
+        # Replay the same traffic against a cache big enough to hold it
+        explainer = model.ReasonCodeExplainer(top_k=3, approximate=approximate, cache_size=len(records))
+        run(model.ModelService(booster, dv, explainer=explainer), events)
+        warm = run(model.ModelService(booster, dv, explainer=explainer), events)["p50_ms"]
+
+        name = "approx_contribs" if approximate else "pred_contribs"
+        print(f"{name:>22}: p50={cold:.2f}ms ({cold - baseline:+.2f}ms) | "
+              f"explain step p50={step:.2f}ms | warm cache p50={warm:.2f}ms ({warm - baseline:+.2f}ms)")
+
+
+if __name__ == "__main__":
+    main()
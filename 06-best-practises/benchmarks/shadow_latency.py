@@ -0,0 +1,86 @@
+"""
+Champion p99 latency per Kinesis batch with no challengers, with
+challengers scored inline, and with challengers scored off the request
+thread.
+
+    python benchmarks/shadow_latency.py --batch-size 100 --batches 300
+"""
+import os
+import sys
+import json
+import base64
+import argparse
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.feature_extraction import DictVectorizer
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, ".."))
+
+import model  # noqa: E402
+
+X_VAL_PATH = os.path.join(BASE_DIR, "../../processed_data/X_val.parquet")
+Y_VAL_PATH = os.path.join(BASE_DIR, "../../processed_data/y_val.txt")
+
+
+def train_bundle(X, y, rounds, seed):
+    params = {"objective": "binary:logistic", "max_depth": 4, "seed": seed, "subsample": 0.8}
+    return xgb.train(params, xgb.DMatrix(X, label=y), num_boost_round=rounds)
+
+
+def make_events(records, batch_size, batches):
+    events = []
+    for b in range(batches):
+        start = (b * batch_size) % (len(records) - batch_size)
+        events.append({"Records": [
+            {"kinesis": {"data": base64.b64encode(json.dumps({"data": r, "data_id": start + i}).encode()).decode()}}
+            for i, r in enumerate(records[start:start + batch_size])
+        ]})
+    return events
+
+
+def run(model_service, events):
+    for event in events:
+        model_service.lambda_handler(event)
+    model_service.shadow.join()
+    return model_service.latency.report()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--batches", type=int, default=300)
+    parser.add_argument("--challengers", type=int, default=2)
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    df = pd.read_parquet(X_VAL_PATH)
+    y = np.loadtxt(Y_VAL_PATH).astype(int)
+    records = [model.prep_features(r) for r in df.astype({c: str for c in model.cat_cols}).to_dict(orient="records")]
+
+    dv = DictVectorizer()
+    X = dv.fit_transform(records)
+    champion = train_bundle(X, y, 200, 0)
+    challengers = {f"challenger_{i}": train_bundle(X, y, 300, i + 1) for i in range(args.challengers)}
+    events = make_events(records, args.batch_size, args.batches)
+
+    scenarios = {
+        "champion only": model.ModelService(champion, dv),
+        "inline challengers": model.ModelService(
+            champion, dv, challengers=challengers, shadow=model.ShadowScorer(budget_ms=args.budget_ms)),
+        "async challengers": model.ModelService(
+            champion, dv, challengers=challengers,
+            shadow=model.ShadowScorer(budget_ms=args.budget_ms, asynchronous=True)),
+    }
+    baseline = None
+    for name, model_service in scenarios.items():
+        report = run(model_service, events)
+        baseline = baseline if baseline is not None else report["p99_ms"]
+        print(f"{name:>20}: p50={report['p50_ms']:.2f}ms p99={report['p99_ms']:.2f}ms "
+              f"({report['p99_ms'] - baseline:+.2f}ms p99) dropped={model_service.shadow.dropped}")
+
+
+if __name__ == "__main__":
+    main()
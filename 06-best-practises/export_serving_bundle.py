@@ -0,0 +1,47 @@
+"""
+Converts a pickled {"model", "vectorizer"} bundle into a serving bundle
+(booster as UBJSON + vocabulary as JSON) that model.py loads without sklearn.
+With --raw-data, the raw application transform is fitted on the training
+applications and stored in the bundle too.
+
+    python export_serving_bundle.py --input xgb_credit_pred.bin --output xgb_credit_pred.serving.zip \
+        --raw-data ../data/application_train.csv
+"""
+import pickle
+import argparse
+
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+import model
+
+
+def fit_raw_transform(path: str) -> model.RawApplicationTransform:
+    """Fits the raw transform on a CSV or Parquet of training applications, reading only the needed columns."""
+    columns = model.RawApplicationTransform.MEDIAN_COLS
+    if path.endswith(".csv"):
+        table = pv.read_csv(path, convert_options=pv.ConvertOptions(include_columns=columns))
+    else:
+        table = pq.read_table(path, columns=columns)
+    return model.RawApplicationTransform.fit({col: table.column(col).to_numpy() for col in columns})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a sklearn-free serving bundle.")
+    parser.add_argument("--input", required=True, help="pickled model bundle (e.g. xgb_credit_pred.bin)")
+    parser.add_argument("--output", required=True, help="serving bundle to write")
+    parser.add_argument("--raw-data", default=None, help="training applications (CSV/Parquet) to fit the raw transform on")
+    args = parser.parse_args()
+
+    with open(args.input, "rb") as f_in:
+        model_bundle = pickle.load(f_in)
+    raw_transform = fit_raw_transform(args.raw_data) if args.raw_data else None
+    with open(args.output, "wb") as f_out:
+        model.write_serving_bundle(model_bundle["model"], model_bundle["vectorizer"], f_out, raw_transform)
+    print(f"✅ Wrote serving bundle to {args.output}")
+    if raw_transform is not None:
+        print(f"   raw transform fill values: {raw_transform.fill_values}")
+
+
+if __name__ == "__main__":
+    main()
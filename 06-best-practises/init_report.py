@@ -0,0 +1,77 @@
+import sys
+import time
+import builtins
+import importlib.util
+
+
+class ImportTimer:
+    """
+    Records how long each first-time import takes, like `python -X importtime`
+    but from inside a running process (e.g. the Lambda init phase, where
+    interpreter flags cannot be passed). Self time excludes nested imports.
+    Imports made through importlib.import_module, and submodules pulled in
+    by `from package import submodule` once the package is loaded, count
+    towards their caller's self time.
+    """
+
+    def __init__(self):
+        self.cumulative_ms = {}
+        self.self_ms = {}
+        self._stack = []
+        self._original_import = None
+        self._start = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        module_name = name
+        if level:
+            try:
+                module_name = importlib.util.resolve_name("." * level + name, (globals or {}).get("__package__"))
+            except (ImportError, ValueError):
+                pass
+        if module_name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            if module_name not in self.cumulative_ms:
+                self.cumulative_ms[module_name] = elapsed
+                self.self_ms[module_name] = elapsed - children
+
+    def install(self):
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+        self._start = time.perf_counter()
+        return self
+
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def by_package(self) -> dict:
+        """Self time summed per top-level package, slowest first."""
+        totals = {}
+        for name, ms in self.self_ms.items():
+            package = name.split(".", 1)[0]
+            totals[package] = totals.get(package, 0.0) + ms
+        return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+    def report(self, top: int = 15, init_ms: float = None):
+        """Prints the slowest packages and modules and the total init duration."""
+        elapsed_ms = (time.perf_counter() - self._start) * 1000 if init_ms is None else init_ms
+        imports_ms = sum(self.self_ms.values())
+        print(f"⏱️ Init {elapsed_ms:.0f}ms | imports {imports_ms:.0f}ms | "
+              f"{len(self.self_ms)} modules imported")
+        for package, ms in list(self.by_package().items())[:top]:
+            print(f"⏱️   package {package:<32} self {ms:8.1f}ms")
+        slowest = sorted(self.cumulative_ms.items(), key=lambda item: -item[1])[:top]
+        for name, ms in slowest:
+            print(f"⏱️   import  {name:<32} cumulative {ms:8.1f}ms | self {self.self_ms[name]:8.1f}ms")
+
@@ -5,7 +5,13 @@ cd "$(dirname "$0")"
 LOCAL_TAG=$(date +"%Y-%m-%d-%H-%M")
 export LOCAL_IMAGE_NAME="credit_default_predictions:${LOCAL_TAG}"
 
-docker build -t ${LOCAL_IMAGE_NAME} ..
+# The image has no sklearn, so serve the sklearn-free bundle (needs requirements-dev.txt here)
+if [ model/xgb_credit_pred.bin -nt model/xgb_credit_pred.serving.zip ]; then
+    python ../export_serving_bundle.py --input model/xgb_credit_pred.bin --output model/xgb_credit_pred.serving.zip || exit 1
+fi
+
+# Context is the repository root (the image needs common/)
+docker build -t ${LOCAL_IMAGE_NAME} -f ../Dockerfile ../..
 
 docker-compose up -d
 
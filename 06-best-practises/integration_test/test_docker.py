@@ -32,9 +32,11 @@ expected_response = {
         {'statusCode': 200, 
          'data_id': 101, 
          'default_probability': 0.07159064710140228, 
-         'default_risk': 'Low'
+         'default_risk': 'Low',
+         'model_version': 'Test123'
          }
-    ]
+    ],
+    'batchItemFailures': []
 }
 
 assert actual_response == expected_response
\ No newline at end of file
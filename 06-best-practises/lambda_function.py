@@ -1,6 +1,14 @@
 import os
+import time
 
-import model
+# INIT_REPORT=true prints an import-time breakdown and the init duration
+INIT_START = time.perf_counter()
+import_timer = None
+if os.getenv('INIT_REPORT', 'false').lower() == 'true':
+    from init_report import ImportTimer
+    import_timer = ImportTimer().install()
+
+import model  # noqa: E402
 
 PREDICTIONS_STREAM_NAME = os.getenv('PREDICTIONS_STREAM_NAME', 'credit_default_predictions')
 RUN_ID = os.getenv('RUN_ID')
@@ -13,6 +21,10 @@ model_service = model.init(
     test_run=TEST_RUN,
 )
 
+if import_timer is not None:
+    import_timer.uninstall()
+    import_timer.report(init_ms=(time.perf_counter() - INIT_START) * 1000)
+
 
 def lambda_handler(event, context):
-    return model_service.lambda_handler(event)
\ No newline at end of file
+    return model_service.lambda_handler(event)
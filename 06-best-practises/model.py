@@ -1,27 +1,45 @@
+import io
 import os
+import sys
 import json
+import math
+import time
 import base64
-import boto3
 import pickle
-import xgboost as xgb
-from sklearn.feature_extraction import DictVectorizer
+import queue
+import struct
+import zipfile
+import threading
+import numpy as np
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+
+# xgboost, scipy and boto3 are imported where they are first needed, so
+# importing this module (and the Lambda init phase) only pays for the
+# backends actually in use. sklearn is never imported at serve time.
+
+# common/ sits next to this file in the images and one level up in the repository
+sys.path.append(os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")))
+from common.features import CAT_COLS, NUM_COLS  # noqa: E402
+from common.raw_transform import (  # noqa: E402,F401
+    RAW_DAY_COLS, RAW_COLS, UNEMPLOYED_DAYS, FeatureColumns, RawApplicationTransform, is_raw_application,
+)
+from common.serving_bundle import (  # noqa: E402,F401
+    SERVING_BUNDLE_ARTIFACT, PICKLED_BUNDLE_ARTIFACT, SERVING_MODEL_ENTRY, SERVING_VOCABULARY_ENTRY,
+    SERVING_TRANSFORM_ENTRY, vocabulary_state, write_serving_bundle,
+)
 
 # Define columns
-cat_cols = ['AGE_GROUP', 'YEARS_EMPLOYED_GROUP', 'PHONE_CHANGE_GROUP']
-num_cols = [
-    'REGION_RATING_CLIENT_W_CITY',
-    'REGION_RATING_CLIENT',
-    'EXT_SOURCE_3',
-    'EXT_SOURCE_2',
-    'EXT_SOURCE_1',
-    'FLOORSMAX_AVG'
-]
+cat_cols = list(CAT_COLS)
+num_cols = list(NUM_COLS)
+FEATURES = cat_cols + num_cols
 
 # S3 bucket where artifacts are stored
 S3_BUCKET = "mlflow-credit-default-risk-prediction-artifact-store-v2"
 REGION = "eu-west-1"
 
-s3_client = boto3.client("s3", region_name=REGION)
+_s3_client = None
+_s3_client_lock = threading.Lock()
 
 RUN_ID = os.getenv("RUN_ID")
 print("RUN_ID:", RUN_ID)
@@ -42,11 +60,65 @@ def get_model_location(run_id: str) -> str:
         Returns the S3 key for the saved XGBoost model artifact.
         """
         print(">>>Fetching from S3 Bucket")
-        return f"{run_id}/artifacts/xgb_credit_pred.bin"
+        return f"{run_id}/artifacts/{os.getenv('MODEL_ARTIFACT', SERVING_BUNDLE_ARTIFACT)}"
+
+
+def get_s3_client():
+    """The process-wide S3 client, created on first use (credentials come from the default chain)."""
+    global _s3_client
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                import boto3
+
+                _s3_client = boto3.client("s3", region_name=os.getenv("AWS_DEFAULT_REGION") or REGION)
+    return _s3_client
+
+
+# --- Model bundles ---
+# The serving bundle (common/serving_bundle.py) loads without sklearn. The
+# pickled {"model", "vectorizer"} bundle is still read, but unpickling its
+# DictVectorizer imports sklearn.
+
+
+def read_bundle(fileobj):
+    """Reads a serving or pickled bundle and returns (booster, VocabularyEncoder)."""
+    import xgboost as xgb
+
+    raw = fileobj.read()
+    if raw[:4] == b"PK\x03\x04":
+        with zipfile.ZipFile(io.BytesIO(raw)) as bundle:
+            booster = xgb.Booster()
+            booster.load_model(bytearray(bundle.read(SERVING_MODEL_ENTRY)))
+            encoder = VocabularyEncoder.from_dict(json.loads(bundle.read(SERVING_VOCABULARY_ENTRY)))
+            if SERVING_TRANSFORM_ENTRY in bundle.namelist():
+                encoder.raw_transform = RawApplicationTransform.from_dict(
+                    json.loads(bundle.read(SERVING_TRANSFORM_ENTRY)))
+        return booster, encoder
+
+    try:
+        model_bundle = pickle.loads(raw)
+    except ModuleNotFoundError as e:
+        # The serving image has no sklearn to unpickle the DictVectorizer with
+        raise ImportError(
+            f"Pickled model bundle needs {e.name} to load; convert it with "
+            f"export_serving_bundle.py and serve {SERVING_BUNDLE_ARTIFACT} instead"
+        ) from e
+    raw_transform = model_bundle.get("transform")
+    if isinstance(raw_transform, dict):
+        raw_transform = RawApplicationTransform.from_dict(raw_transform)
+    return model_bundle["model"], VocabularyEncoder.from_vectorizer(model_bundle["vectorizer"], raw_transform)
+
+
+def load_bundle_from_s3(model_key: str, bucket: str = S3_BUCKET):
+    print(f"📥 Downloading model from s3://{bucket}/{model_key}")
+    response = get_s3_client().get_object(Bucket=bucket, Key=model_key)
+    return read_bundle(response["Body"])
+
 
 def load_model(run_id: str = None, local: bool = False):
     """
-    Loads XGBoost Booster + DictVectorizer.
+    Loads the XGBoost Booster and the vectorizer's VocabularyEncoder.
     If `local=True`, loads from integration_test/model/.
     Otherwise, downloads from S3 using run_id.
     """
@@ -54,34 +126,18 @@ def load_model(run_id: str = None, local: bool = False):
         print("🔧 Running in LOCAL mode")
         # Local mode (Docker / integration tests)
         model_dir = os.getenv("MODEL_LOCATION", "integration_test/model")
-        model_filename = os.getenv("MODEL_FILENAME", "xgb_credit_pred.bin")
+        model_filename = os.getenv("MODEL_FILENAME", SERVING_BUNDLE_ARTIFACT)
         model_path = os.path.join(model_dir, model_filename)
 
         print(f"📂 Looking for model file at: {os.path.abspath(model_path)}")
-        model_path = os.path.join("integration_test", "model", "xgb_credit_pred.bin")
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"❌ Model file not found at {os.path.abspath(model_path)}")
         with open(model_path, "rb") as f:
-            model_bundle = pickle.load(f)
+            booster, dv = read_bundle(f)
     else:
         print("☁️ Running in S3/production mode")
         # Load from S3
-        model_key = get_model_location(run_id)
-        print(f"📥 Downloading model from s3://{S3_BUCKET}/{model_key}")
-
-        region = os.getenv("AWS_DEFAULT_REGION") or "eu-west-1"
-        s3_client = boto3.client(
-            "s3",
-            region_name=region,
-            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-        )
-
-        response = s3_client.get_object(Bucket=S3_BUCKET, Key=model_key)
-        model_bundle = pickle.load(response["Body"])
-
-    booster: xgb.Booster = model_bundle["model"]
-    dv: DictVectorizer = model_bundle["vectorizer"]
+        booster, dv = load_bundle_from_s3(get_model_location(run_id))
 
     print("✅ Model and vectorizer loaded successfully")
     return booster, dv
@@ -99,18 +155,539 @@ def prep_features(data: dict):
             features[col] = 0.0
     return features
     
+
+# --- Record decoding ---
+try:
+    import orjson
+
+    def json_loads(raw):
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # orjson is strict RFC 8259; json.dumps producers may still send NaN/Infinity
+            return json.loads(raw)
+except ImportError:  # json.loads also accepts UTF-8 bytes
+    json_loads = json.loads
+
+
 def base64_decode(encoded_data: str):
-    decoded_data = base64.b64decode(encoded_data).decode("utf-8")
-    json_data = json.loads(decoded_data)
-    return json_data
+    return json_loads(base64.b64decode(encoded_data))
 
 
-class ModelService:
-    def __init__(self, booster, dv, model_version=None, callbacks=None):
+# Packed binary records: 0xCD, schema id, then a fixed-order payload.
+PACKED_MAGIC = 0xCD
+MISSING_CODE = 255
+
+
+class PackedSchemaV1:
+    """
+    Schema 1: data_id (int64), one uint8 code per categorical feature
+    (index into `categories`, 255 = missing/unknown) and the numeric
+    features as float32, coerced like prep_features (absent or invalid ->
+    0.0, NaN kept so XGBoost treats it as missing, as on the JSON path).
+    37 bytes per record against
+    roughly 330 for the JSON envelope. float32 loses nothing the model
+    would see, since XGBoost scores in float32.
+    """
+
+    schema_id = 1
+    categories = {
+        'AGE_GROUP': ['Very_Young', 'Youth', 'Middle_Age', 'Elder'],
+        'YEARS_EMPLOYED_GROUP': ['unemployed and <1 yr', '1-5 yrs', '5-10 yrs', '10-20 yrs',
+                                 '20-30 yrs', '30-40 yrs', '40-50 yrs'],
+        'PHONE_CHANGE_GROUP': ['Recent', 'Moderate', 'Old'],
+    }
+    layout = struct.Struct(f"<BBq{len(cat_cols)}B{len(num_cols)}f")
+    dtype = np.dtype([
+        ("magic", "u1"),
+        ("schema_id", "u1"),
+        ("data_id", "<i8"),
+        ("cats", "u1", (len(cat_cols),)),
+        ("nums", "<f4", (len(num_cols),)),
+    ])
+
+    def __init__(self):
+        self._codes = [{label: i for i, label in enumerate(self.categories[col])} for col in cat_cols]
+        # code -> string, with "" for missing/unknown (same as an absent JSON field)
+        self._labels = [
+            np.array(self.categories[col] + [""] * (256 - len(self.categories[col])), dtype=object)
+            for col in cat_cols
+        ]
+
+    def encode(self, data: dict, data_id: int) -> bytes:
+        codes = [self._codes[j].get(data.get(col), MISSING_CODE) for j, col in enumerate(cat_cols)]
+        features = prep_features(data)
+        nums = [features[col] for col in num_cols]
+        return self.layout.pack(PACKED_MAGIC, self.schema_id, int(data_id), *codes, *nums)
+
+    def decode_into(self, payloads, batch, rows):
+        """Decodes all payloads with one frombuffer and writes them into `batch` at `rows`."""
+        packed = np.frombuffer(b"".join(payloads), dtype=self.dtype)
+        rows = np.asarray(rows)
+        for j in range(len(cat_cols)):
+            batch.cats[rows, j] = self._labels[j][packed["cats"][:, j]]
+        batch.nums[rows] = packed["nums"]
+        for row, data_id in zip(rows.tolist(), packed["data_id"].tolist()):
+            batch.data_ids[row] = data_id
+
+
+PACKED_SCHEMAS = {PackedSchemaV1.schema_id: PackedSchemaV1()}
+
+
+def register_packed_schema(schema):
+    PACKED_SCHEMAS[schema.schema_id] = schema
+
+
+def encode_record(data: dict, data_id, packed: bool = False, schema_id: int = PackedSchemaV1.schema_id) -> bytes:
+    """
+    Producer-side encoder for Kinesis `Data`. JSON by default; with
+    `packed=True` the compact binary format (integer data_id only).
+    """
+    if packed:
+        return PACKED_SCHEMAS[schema_id].encode(data, data_id)
+    return json.dumps({"data": data, "data_id": data_id}, separators=(",", ":")).encode("utf-8")
+
+
+class FeatureBatch(FeatureColumns):
+    """
+    Column arrays for a batch of records: categorical values as strings,
+    numeric values as float64, with the same defaults as prep_features.
+    """
+
+    def __init__(self, size: int):
+        super().__init__(size)
+        self.data_ids = [None] * size
+
+    def __len__(self):
+        return len(self.data_ids)
+
+    @classmethod
+    def from_dicts(cls, features_list, data_ids=None, raw_transform=None):
+        batch = cls(len(features_list))
+        batch.fill_dicts(range(len(features_list)), features_list, raw_transform)
+        if data_ids is not None:
+            batch.data_ids = list(data_ids)
+        return batch
+
+    def fill_dicts(self, rows, records, raw_transform=None):
+        """
+        Fills `rows` from pre-binned feature dicts and/or raw application
+        dicts; the raw ones go through `raw_transform` in one call.
+        """
+        raw_rows, raw_records = [], []
+        for row, data in zip(rows, records):
+            if is_raw_application(data):
+                raw_rows.append(row)
+                raw_records.append(data)
+            else:
+                self.fill(row, data)
+        if raw_rows:
+            if raw_transform is None:
+                raise ValueError("Raw application fields need a RawApplicationTransform")
+            raw_transform.transform_into(RawApplicationTransform.columns_from_dicts(raw_records), self, raw_rows)
+
+    def fill(self, i: int, data: dict):
+        for j, col in enumerate(cat_cols):
+            self.cats[i, j] = str(data.get(col, ""))
+        for j, col in enumerate(num_cols):
+            val = data.get(col)
+            try:
+                self.nums[i, j] = float(val) if val is not None else 0.0
+            except (ValueError, TypeError):
+                self.nums[i, j] = 0.0
+
+    def keys(self):
+        """
+        One hashable (categoricals..., numerics...) tuple per record. NaN
+        becomes None, since NaN != NaN would make a record miss its own key.
+        """
+        return [tuple(c) + tuple(None if v != v else v for v in n)
+                for c, n in zip(self.cats.tolist(), self.nums.tolist())]
+
+
+class VocabularyEncoder:
+    """
+    Builds the same CSR matrix as DictVectorizer.transform straight from a
+    FeatureBatch, using only the vectorizer's vocabulary: numeric features
+    are always stored (explicit zeros included), categoricals become a 1.0
+    in their `col=value` column, and unknown categories are dropped.
+    """
+
+    def __init__(self, vocabulary: dict, separator: str = "=", raw_transform: RawApplicationTransform = None):
+        # Same attribute names as DictVectorizer, so either can be passed around
+        self.vocabulary_ = dict(vocabulary)
+        # The bundle's raw-field preprocessing travels with its vocabulary
+        self.raw_transform = raw_transform
+        self.feature_names_ = sorted(vocabulary, key=vocabulary.get)
+        self.separator = separator
+        self.n_features = len(vocabulary)
+        self.num_index = np.array([vocabulary.get(col, -1) for col in num_cols], dtype=np.int64)
+        self.cat_index = [
+            {name[len(col) + len(separator):]: idx for name, idx in vocabulary.items()
+             if name.startswith(col + separator)}
+            for col in cat_cols
+        ]
+
+    @classmethod
+    def from_vectorizer(cls, dv, raw_transform: RawApplicationTransform = None):
+        if isinstance(dv, cls) and raw_transform is None:
+            return dv
+        return cls(dv.vocabulary_, dv.separator, raw_transform or getattr(dv, "raw_transform", None))
+
+    @classmethod
+    def from_dict(cls, state: dict):
+        return cls(state["vocabulary"], state.get("separator", "="))
+
+    def to_dict(self) -> dict:
+        return vocabulary_state(self)
+
+    def transform(self, batch):
+        """CSR matrix for a FeatureBatch or a list of feature dicts."""
+        import scipy.sparse as sp
+
+        if not isinstance(batch, FeatureBatch):
+            batch = FeatureBatch.from_dicts(batch)
+        n = len(batch)
+        columns = np.empty((n, len(FEATURES)), dtype=np.int64)
+        values = np.ones((n, len(FEATURES)), dtype=np.float64)
+
+        for j, lookup in enumerate(self.cat_index):
+            uniques, inverse = np.unique(batch.cats[:, j].astype(str), return_inverse=True)
+            columns[:, j] = np.array([lookup.get(u, -1) for u in uniques], dtype=np.int64)[inverse.ravel()]
+        columns[:, len(cat_cols):] = self.num_index
+        values[:, len(cat_cols):] = batch.nums
+
+        # DictVectorizer output has sorted column indices within each row
+        present = columns >= 0
+        order = np.argsort(np.where(present, columns, self.n_features), axis=1, kind="stable")
+        columns = np.take_along_axis(columns, order, axis=1)
+        values = np.take_along_axis(values, order, axis=1)
+        present = np.take_along_axis(present, order, axis=1)
+
+        indptr = np.concatenate(([0], np.cumsum(present.sum(axis=1))))
+        return sp.csr_matrix((values[present], columns[present], indptr), shape=(n, self.n_features))
+
+
+class PoisonRecordError(ValueError):
+    """A record that can never be scored, however often it is retried."""
+
+
+def sequence_number(record: dict) -> str:
+    return record.get("kinesis", {}).get("sequenceNumber", "")
+
+
+class LocalDeadLetterSink:
+    """
+    Appends poison records as JSON lines to a local file (e.g. under /tmp
+    in Lambda) together with the error, so they can be inspected and
+    replayed instead of blocking the shard.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+
+    def put(self, record: dict, error: str) -> bool:
+        entry = {
+            "sequenceNumber": sequence_number(record),
+            "partitionKey": record.get("kinesis", {}).get("partitionKey"),
+            "data": record.get("kinesis", {}).get("data"),
+            "error": error,
+            "failed_at": time.time(),
+        }
+        try:
+            with open(self.path, "a") as f_out:
+                f_out.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            print(f"⚠️ Dead-letter write failed: {e}")
+            return False
+        self.count += 1
+        return True
+
+
+class ModelBundle:
+    """
+    A booster/vectorizer pair and the version that produced it.
+    Counts the batches currently scoring with it so a replaced bundle is
+    only released once they have finished.
+    """
+
+    def __init__(self, booster, dv, version=None, challengers=None):
         self.booster = booster
         self.dv = dv
-        self.model_version = model_version
+        self.encoder = VocabularyEncoder.from_vectorizer(dv) if dv is not None else None
+        self.raw_transform = self.encoder.raw_transform if self.encoder is not None else None
+        self.version = version
+        # name -> booster; challengers share this bundle's vectorizer
+        self.challengers = dict(challengers or {})
+        self._in_flight = 0
+        self._idle = threading.Condition()
+
+    def enter(self):
+        with self._idle:
+            self._in_flight += 1
+
+    def exit(self):
+        with self._idle:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._idle.notify_all()
+
+    def release(self, timeout=None) -> bool:
+        """Waits for in-flight batches to finish, then drops the model."""
+        with self._idle:
+            drained = self._idle.wait_for(lambda: self._in_flight == 0, timeout=timeout)
+            if drained:
+                self.booster = None
+                self.dv = None
+                self.encoder = None
+                self.raw_transform = None
+                self.challengers = {}
+        return drained
+
+
+class LatencyTracker:
+    """Keeps the last `window` latencies (ms) and reports percentiles."""
+
+    def __init__(self, window: int = 10000):
+        self.samples = deque(maxlen=window)
+
+    def add(self, millis: float):
+        self.samples.append(millis)
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        return float(np.percentile(np.fromiter(self.samples, dtype=float), q))
+
+    def report(self) -> dict:
+        return {
+            "count": len(self.samples),
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+        }
+
+
+class ShadowScorer:
+    """
+    Scores challengers on an already-encoded batch and emits their
+    predictions to shadow callbacks only.
+
+    Scoring is synchronous by default: Lambda freezes background threads
+    between invocations, so queued work would stall or be lost there. On
+    long-lived hosts, async mode has a single worker thread drain a
+    bounded queue so the request thread only pays for an enqueue. Work is
+    dropped when the
+    queue is full, or when `budget_ms` has already passed since the batch
+    was submitted by the time a challenger would start on it (a started
+    prediction is never cut short). `scored` and `dropped` both count
+    (batch, challenger) pairs.
+    """
+
+    def __init__(self, callbacks=None, budget_ms: float = None, asynchronous: bool = False, max_pending: int = 8):
         self.callbacks = callbacks or []
+        self.budget_ms = budget_ms
+        self.asynchronous = asynchronous
+        self.dropped = 0
+        self.scored = 0
+        # Request threads and the worker both update the counters
+        self._counts_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_pending)
+        # Started here rather than on first submit, so concurrent callers cannot start two
+        self._worker = None
+        if asynchronous:
+            self._worker = threading.Thread(target=self._drain, name="shadow-scorer", daemon=True)
+            self._worker.start()
+
+    def submit(self, challengers: dict, dmatrix, data_ids, champion_version):
+        if not challengers:
+            return
+        job = (list(challengers.items()), dmatrix, data_ids, champion_version, time.perf_counter())
+        if not self.asynchronous:
+            self._score(job)
+            return
+
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self._count(dropped=len(challengers))
+
+    def _count(self, scored: int = 0, dropped: int = 0):
+        with self._counts_lock:
+            self.scored += scored
+            self.dropped += dropped
+
+    def _over_budget(self, submitted: float) -> bool:
+        if self.budget_ms is None:
+            return False
+        return (time.perf_counter() - submitted) * 1000 > self.budget_ms
+
+    def _score(self, job):
+        challengers, dmatrix, data_ids, champion_version, submitted = job
+        for name, booster in challengers:
+            if self._over_budget(submitted):
+                self._count(dropped=1)
+                continue
+            probs = booster.predict(dmatrix)
+            for data_id, prob in zip(data_ids, probs):
+                shadow_event = {
+                    "data_id": data_id,
+                    "challenger": name,
+                    "default_probability": float(prob),
+                    "champion_version": champion_version,
+                }
+                for callback in self.callbacks:
+                    callback(shadow_event)
+            self._count(scored=1)
+
+    def _drain(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._score(job)
+            except Exception as e:
+                print(f"⚠️ Shadow scoring failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """Blocks until every queued batch was scored or dropped."""
+        self._queue.join()
+
+
+class ReasonCodeExplainer:
+    """
+    Adverse-action reason codes from XGBoost tree contributions.
+
+    Contributions are computed with `pred_contribs` for the whole batch on
+    the DMatrix the champion just scored. The one-hot columns of the
+    DictVectorizer are summed back into the 9 input features, and the
+    `top_k` features that push the default probability up the most are
+    returned per record. `approximate=True` uses `approx_contribs`
+    (Saabas), which is much cheaper than exact TreeSHAP.
+    Folded contributions are cached by (model version, prepared features).
+    """
+
+    def __init__(self, top_k: int = 3, approximate: bool = False, cache_size: int = 10000):
+        self.top_k = top_k
+        self.approximate = approximate
+        self.cache_size = cache_size
+        self.latency = LatencyTracker()
+        self._cache = OrderedDict()
+        self._fold = (None, None)
+
+    def fold_matrix(self, dv) -> np.ndarray:
+        """(n_vectorizer_columns, n_input_features) 0/1 matrix mapping columns to input features."""
+        cached_dv, matrix = self._fold
+        if cached_dv is dv:
+            return matrix
+        matrix = np.zeros((len(dv.feature_names_), len(FEATURES)), dtype=np.float32)
+        for i, name in enumerate(dv.feature_names_):
+            matrix[i, FEATURES.index(name.split(dv.separator, 1)[0])] = 1.0
+        self._fold = (dv, matrix)
+        return matrix
+
+    def contributions(self, bundle: ModelBundle, batch, dmatrix) -> np.ndarray:
+        """Per-record contributions (log-odds) of each input feature, shape (n, 9)."""
+        if not isinstance(batch, FeatureBatch):
+            batch = FeatureBatch.from_dicts(batch)
+        keys = [(bundle.version, key) for key in batch.keys()]
+        folded = np.empty((len(keys), len(FEATURES)), dtype=np.float32)
+
+        misses = []
+        for i, key in enumerate(keys):
+            row = self._cache.get(key)
+            if row is None:
+                misses.append(i)
+            else:
+                self._cache.move_to_end(key)
+                folded[i] = row
+
+        if misses:
+            miss_matrix = dmatrix if len(misses) == len(keys) else dmatrix.slice(misses)
+            contribs = bundle.booster.predict(
+                miss_matrix, pred_contribs=True, approx_contribs=self.approximate
+            )
+            # last column is the bias term
+            folded[misses] = contribs[:, :-1] @ self.fold_matrix(bundle.encoder)
+            for i in misses:
+                self._cache[keys[i]] = folded[i].copy()
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return folded
+
+    def explain(self, bundle: ModelBundle, batch, dmatrix):
+        """Returns one list of reason codes per record."""
+        start = time.perf_counter()
+        folded = self.contributions(bundle, batch, dmatrix)
+        top = np.argsort(-folded, axis=1)[:, :self.top_k]
+
+        reasons = []
+        for row, order in zip(folded, top):
+            reasons.append([
+                {"feature": FEATURES[j], "contribution": float(row[j])}
+                for j in order if row[j] > 0
+            ])
+        self.latency.add((time.perf_counter() - start) * 1000)
+        return reasons
+
+
+class ModelService:
+    def __init__(self, booster, dv, model_version=None, callbacks=None, challengers=None, shadow=None,
+                 explainer=None, dead_letter=None):
+        self.bundle = ModelBundle(booster, dv, model_version, challengers)
+        self.callbacks = callbacks or []
+        self.dead_letter = dead_letter
+        self.shadow = shadow or ShadowScorer()
+        self.explainer = explainer
+        # champion latency per batch, challenger submission included
+        self.latency = LatencyTracker()
+
+    # The bundle is replaced as a whole (a single reference assignment), so
+    # readers never see a booster paired with another version's vectorizer.
+    @property
+    def booster(self):
+        return self.bundle.booster
+
+    @property
+    def dv(self):
+        return self.bundle.dv
+
+    @property
+    def model_version(self):
+        return self.bundle.version
+
+    @contextmanager
+    def pinned_bundle(self):
+        """
+        Pins the current bundle for the duration of a batch. The counter is
+        only touched on entry and exit; no lock is held while scoring.
+        """
+        while True:
+            bundle = self.bundle
+            bundle.enter()
+            # A swap between reading and pinning means release() may not
+            # have seen us; retry on the new bundle instead.
+            if bundle is self.bundle:
+                break
+            bundle.exit()
+        try:
+            yield bundle
+        finally:
+            bundle.exit()
+
+    def swap(self, booster, dv, model_version, challengers=None):
+        """
+        Atomically installs a new model and returns the bundle it replaced.
+        Without `challengers`, the current ones are kept if the new
+        vectorizer has the same vocabulary, since they share it.
+        """
+        old_bundle = self.bundle
+        if challengers is None and old_bundle.dv is not None and old_bundle.dv.vocabulary_ == dv.vocabulary_:
+            challengers = old_bundle.challengers
+        self.bundle = ModelBundle(booster, dv, model_version, challengers)
+        return old_bundle
 
     def prepare_features(self, data: dict):
         features = {}
@@ -124,42 +701,428 @@ class ModelService:
                 features[col] = 0.0
         return features
 
-    def predict(self, features: dict) -> float:
-        X = self.dv.transform([features])  # sparse
-        dmatrix = xgb.DMatrix(X)
-        prob = self.booster.predict(dmatrix)[0]
+    def predict(self, features: dict, bundle: ModelBundle = None) -> float:
+        if bundle is None:
+            with self.pinned_bundle() as bundle:
+                return self.predict(features, bundle)
+        import xgboost as xgb
+
+        dmatrix = xgb.DMatrix(bundle.encoder.transform([features]))
+        prob = bundle.booster.predict(dmatrix)[0]
         return float(prob)
 
-    def lambda_handler(self, event):
-        predictions_events = []
+    def predict_batch(self, batch, bundle: ModelBundle = None):
+        """
+        Encodes the batch once and scores it with the champion.
+        `batch` is a FeatureBatch or a list of feature dicts.
+        Returns (probabilities, dmatrix) so challengers can reuse the encoding.
+        """
+        if bundle is None:
+            with self.pinned_bundle() as bundle:
+                return self.predict_batch(batch, bundle)
+        import xgboost as xgb
+
+        dmatrix = xgb.DMatrix(bundle.encoder.transform(batch))
+        return bundle.booster.predict(dmatrix), dmatrix
 
-        for record in event["Records"]:
-            encoded_data = record["kinesis"]["data"]
-            data_event = base64_decode(encoded_data)
+    def decode_record(self, record: dict):
+        """
+        Returns ("packed", schema, payload) for a binary record or
+        ("json", data_id, data) for a JSON one; raises PoisonRecordError.
+        """
+        try:
+            raw = base64.b64decode(record["kinesis"]["data"])
+            if raw[:1] == bytes([PACKED_MAGIC]):
+                schema = PACKED_SCHEMAS.get(raw[1]) if len(raw) > 1 else None
+                if schema is None:
+                    raise ValueError(f"unknown packed schema {raw[1] if len(raw) > 1 else None}")
+                if len(raw) != schema.dtype.itemsize:
+                    raise ValueError(f"packed schema {schema.schema_id} expects {schema.dtype.itemsize} bytes, "
+                                     f"got {len(raw)}")
+                return "packed", schema, raw
+            data_event = json_loads(raw)
             data = data_event["data"]
             data_id = data_event["data_id"]
+            if not isinstance(data, dict):
+                raise TypeError(f"'data' must be an object, got {type(data).__name__}")
+            return "json", data_id, data
+        except Exception as e:
+            raise PoisonRecordError(f"{type(e).__name__}: {e}") from e
+
+    def decode_records(self, records, bundle: ModelBundle = None):
+        """
+        Decodes records, in order, straight into one FeatureBatch.
+        JSON records are written row by row, raw applications go through
+        the bundle's RawApplicationTransform in one call, and packed records
+        are grouped by schema and decoded with a single frombuffer each.
+        Returns (batch, decoded records, failed record or None): decoding
+        stops at the first poison record that was not dead-lettered.
+        """
+        raw_transform = (bundle or self.bundle).raw_transform
+        decoded = []
+        packed = {}
+        json_rows = []
+        json_ids = []
+        json_records = []
+        failed = None
+        for record in records:
+            try:
+                kind, first, second = self.decode_record(record)
+                if kind == "json" and is_raw_application(second) and raw_transform is None:
+                    raise PoisonRecordError("raw application fields, but the model bundle has no raw transform")
+            except PoisonRecordError as e:
+                if self.dead_letter is not None and self.dead_letter.put(record, str(e)):
+                    continue
+                print(f"❌ Poison record {sequence_number(record)}: {e}")
+                failed = record
+                break
+            row = len(decoded)
+            decoded.append(record)
+            if kind == "packed":
+                payloads, rows = packed.setdefault(first.schema_id, ([], []))
+                payloads.append(second)
+                rows.append(row)
+            else:
+                json_rows.append(row)
+                json_ids.append(first)
+                json_records.append(second)
+
+        batch = FeatureBatch(len(decoded))
+        for row, data_id in zip(json_rows, json_ids):
+            batch.data_ids[row] = data_id
+        batch.fill_dicts(json_rows, json_records, raw_transform)
+        for schema_id, (payloads, rows) in packed.items():
+            PACKED_SCHEMAS[schema_id].decode_into(payloads, batch, rows)
+        return batch, decoded, failed
+
+    def lambda_handler(self, event):
+        """
+        Scores a Kinesis batch and reports failures per record.
+
+        Kinesis retries a partial batch from the lowest reported sequence
+        number onwards, so records are handled in order and processing stops
+        at the first record that cannot be handled: nothing after it is
+        scored, and nothing before it is ever scored again. Records that
+        can never succeed (bad base64/JSON/envelope) go to the dead-letter
+        sink when one is configured and are then treated as handled.
+        """
+        predictions_events = []
+        batch_item_failures = []
+        start = time.perf_counter()
+
+        # Pin one bundle for the whole batch; a concurrent swap only affects the next batch
+        with self.pinned_bundle() as bundle:
+            batch, records, failed = self.decode_records(event["Records"], bundle)
+            if failed is not None:
+                batch_item_failures.append({"itemIdentifier": sequence_number(failed)})
+            data_ids = batch.data_ids
+
+            if len(batch):
+                try:
+                    probs, dmatrix = self.predict_batch(batch, bundle)
+                except Exception as e:
+                    # Nothing was emitted yet: retry everything from the first scored record
+                    print(f"❌ Batch scoring failed: {e}")
+                    return {
+                        "predictions": [],
+                        "batchItemFailures": [{"itemIdentifier": sequence_number(records[0])}],
+                    }
+
+                reasons = None
+                if self.explainer is not None:
+                    try:
+                        reasons = self.explainer.explain(bundle, batch, dmatrix)
+                    except Exception as e:
+                        # Reason codes are optional: a retry would hit the same error, so score without them
+                        print(f"⚠️ Reason codes failed, emitting predictions without them: {e}")
+
+                for i, (data_id, prob) in enumerate(zip(data_ids, probs)):
+                    prediction = float(prob)
+                    prediction_event = {
+                        "statusCode": 200,
+                        "data_id": data_id,
+                        "default_probability": prediction,
+                        "default_risk": "High" if prediction >= 0.5 else "Low",
+                        "model_version": bundle.version,
+                    }
+                    if reasons is not None:
+                        prediction_event["reason_codes"] = reasons[i]
+
+                    try:
+                        for callback in self.callbacks:
+                            callback(prediction_event)
+                    except Exception as e:
+                        print(f"❌ Callback failed for record {sequence_number(records[i])}: {e}")
+                        batch_item_failures = [{"itemIdentifier": sequence_number(records[i])}]
+                        data_ids = data_ids[:i]
+                        dmatrix = dmatrix.slice(list(range(i))) if i else None
+                        break
 
-            features = self.prepare_features(data)
-            prediction = self.predict(features)
+                    predictions_events.append(prediction_event)
 
-            prediction_event = {
-                "statusCode": 200,
-                "data_id": data_id,
-                "default_probability": prediction,
-                "default_risk": "High" if prediction >= 0.5 else "Low",
-            }
+                # Challenger scores go to the shadow sink only, never into the response
+                if data_ids:
+                    self.shadow.submit(bundle.challengers, dmatrix, data_ids, bundle.version)
+
+        self.latency.add((time.perf_counter() - start) * 1000)
+        return {"predictions": predictions_events, "batchItemFailures": batch_item_failures}
+
+
+# --- Model hot-swap ---
+WARMUP_RECORD = {
+    "AGE_GROUP": "Youth",
+    "YEARS_EMPLOYED_GROUP": "1-5 yrs",
+    "PHONE_CHANGE_GROUP": "Moderate",
+    "REGION_RATING_CLIENT_W_CITY": 2,
+    "REGION_RATING_CLIENT": 2,
+    "EXT_SOURCE_3": 0.5,
+    "EXT_SOURCE_2": 0.5,
+    "EXT_SOURCE_1": 0.5,
+    "FLOORSMAX_AVG": 0.2
+}
+
+
+class LocalFilePointer:
+    """
+    Pointer file holding the path of the bundle to serve.
+    The version is the path plus the bundle's modification time in
+    nanoseconds and its size, so rewriting the bundle in place (even
+    twice within a second) also triggers a swap.
+    """
 
-            for callback in self.callbacks:
-                callback(prediction_event)
+    def __init__(self, path: str):
+        self.path = path
 
-            predictions_events.append(prediction_event)
+    def _bundle_path(self) -> str:
+        with open(self.path) as f:
+            bundle_path = f.read().strip()
+        if not os.path.isabs(bundle_path):
+            bundle_path = os.path.join(os.path.dirname(os.path.abspath(self.path)), bundle_path)
+        return bundle_path
 
-        return {"predictions": predictions_events}
+    def current_version(self) -> str:
+        bundle_path = self._bundle_path()
+        stat = os.stat(bundle_path)
+        return f"{bundle_path}@{stat.st_mtime_ns}:{stat.st_size}"
+
+    def load(self, version: str):
+        with open(version.rsplit("@", 1)[0], "rb") as f:
+            return read_bundle(f)
+
+
+class S3Pointer:
+    """S3 object whose body is the MLflow run id to serve."""
+
+    def __init__(self, bucket: str, key: str):
+        self.bucket = bucket
+        self.key = key
+
+    def current_version(self) -> str:
+        response = get_s3_client().get_object(Bucket=self.bucket, Key=self.key)
+        return response["Body"].read().decode("utf-8").strip()
+
+    def load(self, version: str):
+        return load_bundle_from_s3(get_model_location(version))
+
+
+class MLflowAliasPointer:
+    """
+    MLflow registry alias (e.g. models:/credit_default_risk_xgb_model_v2@champion).
+    The bundle is the serving bundle logged in the same run as the
+    registered model (the retraining flow logs both). Runs logged by the
+    training notebook only have the pickled bundle, which is loaded
+    instead and needs sklearn (or an export with export_serving_bundle.py).
+    """
+
+    def __init__(self, model_name: str, alias: str, bundle_artifact: str = SERVING_BUNDLE_ARTIFACT,
+                 fallback_artifact: str = PICKLED_BUNDLE_ARTIFACT):
+        from mlflow.tracking import MlflowClient  # only needed when the registry is watched
+
+        self.model_name = model_name
+        self.alias = alias
+        self.bundle_artifact = bundle_artifact
+        self.fallback_artifact = fallback_artifact
+        self.client = MlflowClient()
+
+    def current_version(self) -> str:
+        return self.client.get_model_version_by_alias(self.model_name, self.alias).run_id
+
+    def load(self, version: str):
+        artifacts = {artifact.path for artifact in self.client.list_artifacts(version)}
+        artifact = next((a for a in (self.bundle_artifact, self.fallback_artifact) if a in artifacts), None)
+        if artifact is None:
+            raise FileNotFoundError(
+                f"Run {version} has neither {self.bundle_artifact} nor {self.fallback_artifact}; "
+                f"log a bundle exported with export_serving_bundle.py to it"
+            )
+        bundle_path = self.client.download_artifacts(version, artifact)
+        with open(bundle_path, "rb") as f:
+            return read_bundle(f)
+
+
+def parse_model_pointer(pointer: str):
+    """
+    file:///path/to/pointer, s3://bucket/key or models:/<name>@<alias>.
+    """
+    if pointer.startswith("s3://"):
+        bucket, key = pointer[len("s3://"):].split("/", 1)
+        return S3Pointer(bucket, key)
+    if pointer.startswith("models:/"):
+        model_name, alias = pointer[len("models:/"):].split("@", 1)
+        return MLflowAliasPointer(model_name, alias)
+    if pointer.startswith("file://"):
+        pointer = pointer[len("file://"):]
+    return LocalFilePointer(pointer)
+
+
+def resolve_model_pointer(pointer: str):
+    """
+    Parses MODEL_POINTER. A pointer whose backend is not installed (mlflow
+    for models:/...) disables hot-swapping instead of failing init.
+    """
+    try:
+        return parse_model_pointer(pointer)
+    except ImportError as e:
+        print(f"⚠️ MODEL_POINTER={pointer} ignored, model hot-swap disabled: {e}")
+        return None
+
+
+def load_initial_model(run_id: str, local: bool, pointer=None):
+    """
+    Returns (booster, dv, version). With a pointer, the bundle it names is
+    served under the pointer's version, so the watcher's first poll does
+    not reload the same model. Falls back to `run_id` if the pointer
+    cannot be read.
+    """
+    if pointer is not None:
+        try:
+            version = pointer.current_version()
+            booster, dv = pointer.load(version)
+            return booster, dv, version
+        except Exception as e:
+            print(f"⚠️ Could not load the model from MODEL_POINTER, serving RUN_ID {run_id}: {e}")
+    booster, dv = load_model(run_id, local)
+    return booster, dv, run_id
+
+
+def validate_bundle(booster, dv):
+    """Checks the bundle is usable and runs a warm-up prediction."""
+    import xgboost as xgb
+
+    if not isinstance(booster, xgb.Booster):
+        raise ValueError(f"Expected xgb.Booster, got {type(booster).__name__}")
+    missing = [col for col in num_cols if col not in dv.vocabulary_]
+    if missing:
+        raise ValueError(f"Vectorizer is missing features: {missing}")
+
+    encoder = VocabularyEncoder.from_vectorizer(dv)
+    prob = float(booster.predict(xgb.DMatrix(encoder.transform([prep_features(WARMUP_RECORD)])))[0])
+    if not (math.isfinite(prob) and 0.0 <= prob <= 1.0):
+        raise ValueError(f"Warm-up prediction out of range: {prob}")
+
+
+class ModelWatcher:
+    """
+    Polls a model pointer in a background thread. When the pointer moves,
+    the new bundle is loaded, validated and warmed up off the request path,
+    swapped into the service in one assignment, and the old bundle is
+    released once its in-flight batches have finished.
+    """
+
+    def __init__(self, model_service: ModelService, pointer, interval: float = 60.0):
+        self.model_service = model_service
+        self.pointer = pointer
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self) -> bool:
+        """Polls the pointer once. Returns True if a new model was installed."""
+        version = self.pointer.current_version()
+        if version == self.model_service.model_version:
+            return False
+
+        start = time.perf_counter()
+        booster, dv = self.pointer.load(version)
+        validate_bundle(booster, dv)
+        old_bundle = self.model_service.swap(booster, dv, version)
+        print(f"🔄 Swapped model {old_bundle.version} -> {version} in {time.perf_counter() - start:.2f}s")
+
+        old_bundle.release()
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                # Keep serving the current model; try again on the next poll
+                print(f"⚠️ Model refresh failed: {e}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def print_shadow_event(shadow_event: dict):
+    print("SHADOW", json.dumps(shadow_event))
+
+
+def load_challengers(spec: str, dv, local: bool):
+    """
+    Parses CHALLENGERS ("name=run_id,name2=run_id2") and loads each
+    booster. Challengers whose vectorizer differs from the champion's are
+    skipped, because they are scored on the champion's encoding.
+    """
+    challengers = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, run_id = item.split("=", 1)
+        booster, challenger_dv = load_model(run_id, local)
+        if challenger_dv.vocabulary_ != dv.vocabulary_:
+            print(f"⚠️ Skipping challenger {name}: vectorizer differs from the champion's")
+            continue
+        challengers[name] = booster
+    return challengers
 
 
 def init(prediction_stream_name: str, run_id: str, test_run: bool):
     is_local = os.getenv("LOCAL", "false").lower() == "true"
-    booster, dv = load_model(run_id, is_local)
+    model_pointer = os.getenv("MODEL_POINTER")
+    pointer = resolve_model_pointer(model_pointer) if model_pointer else None
+    booster, dv, model_version = load_initial_model(run_id, is_local, pointer)
     callbacks = []
-    model_service = ModelService(booster=booster, dv=dv, model_version=run_id, callbacks=callbacks)
-    return model_service
\ No newline at end of file
+
+    challengers = load_challengers(os.getenv("CHALLENGERS", ""), dv, is_local)
+    budget_ms = os.getenv("SHADOW_BUDGET_MS")
+    shadow = ShadowScorer(
+        callbacks=[print_shadow_event],
+        budget_ms=float(budget_ms) if budget_ms else None,
+        asynchronous=os.getenv("SHADOW_ASYNC", "false").lower() == "true",
+    )
+
+    dead_letter_path = os.getenv("DEAD_LETTER_PATH")
+    explain_top_k = int(os.getenv("EXPLAIN_TOP_K", "0"))
+    explainer = None
+    if explain_top_k > 0:
+        explainer = ReasonCodeExplainer(
+            top_k=explain_top_k,
+            approximate=os.getenv("EXPLAIN_APPROX", "false").lower() == "true",
+        )
+
+    model_service = ModelService(
+        booster=booster, dv=dv, model_version=model_version, callbacks=callbacks,
+        challengers=challengers, shadow=shadow, explainer=explainer,
+        dead_letter=LocalDeadLetterSink(dead_letter_path) if dead_letter_path else None,
+    )
+
+    if pointer is not None:
+        poll_seconds = float(os.getenv("MODEL_POLL_SECONDS", "60"))
+        ModelWatcher(model_service, pointer, poll_seconds).start()
+
+    return model_service
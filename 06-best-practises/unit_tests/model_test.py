@@ -1,4 +1,20 @@
+import io
+import os
+import sys
+import json
+import base64
+import pickle
+import threading
+import types
+import subprocess
+
+import numpy as np
+import pytest
+import xgboost as xgb
+from sklearn.feature_extraction import DictVectorizer
+
 import model
+import batch_score
 
 def test_prepare_features():
     features = {
@@ -50,4 +66,524 @@ def test_base64_decode():
     assert expected_data == decoded_data
     
 def test_setup():
-    assert 3 > 2
\ No newline at end of file
+    assert 3 > 2
+
+
+def _train_bundle(rounds: int = 3):
+    """Tiny booster + vectorizer trained on perturbed copies of WARMUP_RECORD."""
+    rng = np.random.default_rng(0)
+    records = []
+    for _ in range(200):
+        record = dict(model.WARMUP_RECORD)
+        record["EXT_SOURCE_3"] = float(rng.random())
+        records.append(model.prep_features(record))
+    labels = [int(r["EXT_SOURCE_3"] < 0.5) for r in records]
+
+    dv = DictVectorizer()
+    X = dv.fit_transform(records)
+    booster = xgb.train({"objective": "binary:logistic"}, xgb.DMatrix(X, label=labels), num_boost_round=rounds)
+    return booster, dv
+
+
+def _kinesis_event(data: dict, data_id=101):
+    payload = base64.b64encode(json.dumps({"data": data, "data_id": data_id}).encode("utf-8")).decode("utf-8")
+    return {"Records": [{"kinesis": {"data": payload, "sequenceNumber": str(data_id)}}]}
+
+
+def test_prediction_event_records_model_version():
+    booster, dv = _train_bundle()
+    model_service = model.ModelService(booster, dv, model_version="run-1")
+
+    result = model_service.lambda_handler(_kinesis_event(model.WARMUP_RECORD))
+
+    assert result["predictions"][0]["model_version"] == "run-1"
+
+
+def test_watcher_swaps_model_from_local_pointer(tmp_path):
+    booster, dv = _train_bundle()
+    model_service = model.ModelService(booster, dv, model_version="run-1")
+
+    bundle_path = tmp_path / "xgb_credit_pred.bin"
+    new_booster, new_dv = _train_bundle(5)
+    with open(bundle_path, "wb") as f_out:
+        pickle.dump({"model": new_booster, "vectorizer": new_dv}, f_out)
+    pointer_path = tmp_path / "current"
+    pointer_path.write_text("xgb_credit_pred.bin")
+
+    old_bundle = model_service.bundle
+    watcher = model.ModelWatcher(model_service, model.parse_model_pointer(f"file://{pointer_path}"))
+
+    assert watcher.check()
+    assert model_service.booster.num_boosted_rounds() == new_booster.num_boosted_rounds()
+    assert model_service.model_version.startswith(str(bundle_path))
+    assert old_bundle.booster is None
+    # Pointer unchanged -> nothing to do
+    assert not watcher.check()
+
+
+def test_local_pointer_sees_two_rewrites_within_one_second(tmp_path):
+    bundle_path = tmp_path / "bundle.serving.zip"
+    pointer_path = tmp_path / "current"
+    pointer_path.write_text("bundle.serving.zip")
+    pointer = model.parse_model_pointer(f"file://{pointer_path}")
+
+    second = 1_700_000_000 * 10 ** 9
+    bundle_path.write_bytes(b"first")
+    os.utime(bundle_path, ns=(second, second))
+    first_version = pointer.current_version()
+    bundle_path.write_bytes(b"second")
+    os.utime(bundle_path, ns=(second + 1000, second + 1000))
+
+    assert pointer.current_version() != first_version
+
+
+def test_alias_pointer_falls_back_to_the_pickled_bundle_of_notebook_runs(tmp_path, monkeypatch):
+    booster, dv = _train_bundle(5)
+    with open(tmp_path / model.PICKLED_BUNDLE_ARTIFACT, "wb") as f_out:
+        pickle.dump({"model": booster, "vectorizer": dv}, f_out)
+
+    class FakeClient:
+        def list_artifacts(self, run_id):
+            return [types.SimpleNamespace(path=model.PICKLED_BUNDLE_ARTIFACT), types.SimpleNamespace(path="models")]
+
+        def download_artifacts(self, run_id, path):
+            return str(tmp_path / path)
+
+    tracking = types.SimpleNamespace(MlflowClient=FakeClient)
+    monkeypatch.setitem(sys.modules, "mlflow", types.SimpleNamespace(tracking=tracking))
+    monkeypatch.setitem(sys.modules, "mlflow.tracking", tracking)
+    pointer = model.parse_model_pointer("models:/credit_default_risk_xgb_model_v2@champion")
+
+    loaded_booster, _ = pointer.load("notebook-run")
+
+    assert loaded_booster.num_boosted_rounds() == 5
+
+
+def test_init_serves_pointer_version_so_first_poll_is_a_no_op(tmp_path, monkeypatch):
+    booster, dv = _train_bundle(5)
+    with open(tmp_path / "bundle.serving.zip", "wb") as f_out:
+        model.write_serving_bundle(booster, dv, f_out)
+    pointer_path = tmp_path / "current"
+    pointer_path.write_text("bundle.serving.zip")
+    monkeypatch.setenv("MODEL_POINTER", f"file://{pointer_path}")
+    monkeypatch.setenv("MODEL_POLL_SECONDS", "3600")
+    monkeypatch.setattr(model, "load_model", lambda *args: pytest.fail("RUN_ID bundle loaded"))
+
+    model_service = model.init("stream", "run-1", test_run=True)
+
+    pointer = model.parse_model_pointer(f"file://{pointer_path}")
+    assert model_service.model_version == pointer.current_version()
+    assert not model.ModelWatcher(model_service, pointer).check()
+
+
+def test_unusable_model_pointer_falls_back_to_run_id(monkeypatch):
+    monkeypatch.setenv("MODEL_POINTER", "models:/credit_default_risk_xgb_model_v2@champion")
+    monkeypatch.setitem(sys.modules, "mlflow", None)  # mlflow is optional in the image
+    monkeypatch.setattr(model, "load_model", lambda *args: _train_bundle())
+
+    model_service = model.init("stream", "run-1", test_run=True)
+
+    assert model_service.model_version == "run-1"
+
+
+def test_old_model_released_only_after_in_flight_batch():
+    booster, dv = _train_bundle()
+    model_service = model.ModelService(booster, dv, model_version="run-1")
+
+    with model_service.pinned_bundle() as in_flight:
+        old_bundle = model_service.swap(*_train_bundle(5), "run-2")
+        assert not old_bundle.release(timeout=0.01)
+        # The pinned batch keeps scoring with the model it started with
+        assert 0.0 <= model_service.predict(model.prep_features(model.WARMUP_RECORD), in_flight) <= 1.0
+
+    assert old_bundle.release(timeout=1)
+    assert old_bundle.booster is None
+    assert model_service.model_version == "run-2"
+
+
+def test_invalid_bundle_is_not_swapped_in():
+    booster, dv = _train_bundle()
+    model_service = model.ModelService(booster, dv, model_version="run-1")
+
+    class BrokenPointer:
+        def current_version(self):
+            return "run-2"
+
+        def load(self, version):
+            return "not a booster", dv
+
+    with pytest.raises(ValueError):
+        model.ModelWatcher(model_service, BrokenPointer()).check()
+    assert model_service.model_version == "run-1"
+    assert model_service.booster is booster
+
+
+def test_challengers_score_to_shadow_sink_only():
+    booster, dv = _train_bundle()
+    challenger, _ = _train_bundle(5)
+    shadow_events = []
+    shadow = model.ShadowScorer(callbacks=[shadow_events.append], asynchronous=False)
+    model_service = model.ModelService(booster, dv, model_version="run-1",
+                                       challengers={"deeper": challenger}, shadow=shadow)
+
+    result = model_service.lambda_handler(_kinesis_event(model.WARMUP_RECORD, data_id=7))
+
+    assert set(result["predictions"][0]) == {"statusCode", "data_id", "default_probability",
+                                             "default_risk", "model_version"}
+    expected = float(challenger.predict(xgb.DMatrix(dv.transform([model.prep_features(model.WARMUP_RECORD)])))[0])
+    assert shadow_events == [{
+        "data_id": 7,
+        "challenger": "deeper",
+        "default_probability": expected,
+        "champion_version": "run-1",
+    }]
+    assert model_service.latency.report()["count"] == 1
+
+
+def test_async_shadow_drops_work_over_budget():
+    booster, dv = _train_bundle()
+    shadow_events = []
+    shadow = model.ShadowScorer(callbacks=[shadow_events.append], budget_ms=0.0, asynchronous=True)
+    model_service = model.ModelService(booster, dv, challengers={"a": booster, "b": booster}, shadow=shadow)
+
+    model_service.lambda_handler(_kinesis_event(model.WARMUP_RECORD))
+    shadow.join()
+
+    assert shadow_events == []
+    assert shadow.dropped == 2
+
+
+def test_full_shadow_queue_drops_every_challenger_of_the_batch():
+    booster, dv = _train_bundle()
+    started, release = threading.Event(), threading.Event()
+
+    def blocking_callback(shadow_event):
+        started.set()
+        release.wait()
+
+    shadow = model.ShadowScorer(callbacks=[blocking_callback], max_pending=1, asynchronous=True)
+    challengers = {"a": booster, "b": booster}
+    dmatrix = xgb.DMatrix(dv.transform([model.prep_features(model.WARMUP_RECORD)]))
+
+    shadow.submit(challengers, dmatrix, [1], "run-1")
+    assert started.wait(5)  # the worker holds the first batch
+    shadow.submit(challengers, dmatrix, [2], "run-1")  # queued
+    shadow.submit(challengers, dmatrix, [3], "run-1")  # queue full
+    release.set()
+    shadow.join()
+
+    assert shadow.dropped == 2
+    assert shadow.scored == 4
+
+
+def test_shadow_scoring_is_synchronous_by_default_with_one_async_worker():
+    booster, dv = _train_bundle()
+    dmatrix = xgb.DMatrix(dv.transform([model.prep_features(model.WARMUP_RECORD)]))
+    shadow_events = []
+
+    shadow = model.ShadowScorer(callbacks=[shadow_events.append])
+    shadow.submit({"a": booster}, dmatrix, [1], "run-1")
+    assert (shadow.asynchronous, shadow._worker, len(shadow_events)) == (False, None, 1)
+
+    before = sum(t.name == "shadow-scorer" for t in threading.enumerate())
+    shadow = model.ShadowScorer(callbacks=[shadow_events.append], asynchronous=True, max_pending=64)
+    threads = [threading.Thread(target=shadow.submit, args=({"a": booster}, dmatrix, [i], "run-1"))
+               for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    shadow.join()
+
+    assert sum(t.name == "shadow-scorer" for t in threading.enumerate()) - before == 1
+    assert shadow.scored == 16
+
+
+def test_reason_codes_fold_one_hot_contributions():
+    booster, dv = _train_bundle()
+    explainer = model.ReasonCodeExplainer(top_k=2)
+    model_service = model.ModelService(booster, dv, model_version="run-1", explainer=explainer)
+    record = dict(model.WARMUP_RECORD, EXT_SOURCE_3=0.1)
+
+    result = model_service.lambda_handler(_kinesis_event(record))
+    reasons = result["predictions"][0]["reason_codes"]
+
+    assert reasons[0]["feature"] == "EXT_SOURCE_3"
+    assert reasons[0]["contribution"] > 0
+    assert len(reasons) <= 2
+
+    # Folded contributions plus the bias add back up to the margin
+    features = [model.prep_features(record)]
+    dmatrix = xgb.DMatrix(dv.transform(features))
+    folded = explainer.contributions(model_service.bundle, features, dmatrix)
+    bias = booster.predict(dmatrix, pred_contribs=True)[0, -1]
+    margin = booster.predict(dmatrix, output_margin=True)[0]
+    assert folded.shape == (1, len(model.FEATURES))
+    assert folded.sum() + bias == pytest.approx(margin, abs=1e-5)
+
+
+def test_explainer_failure_still_emits_predictions():
+    booster, dv = _train_bundle()
+
+    class BrokenExplainer:
+        def explain(self, bundle, batch, dmatrix):
+            raise RuntimeError("explainer bug")
+
+    model_service = model.ModelService(booster, dv, explainer=BrokenExplainer())
+
+    result = model_service.lambda_handler(_kinesis_event(model.WARMUP_RECORD))
+
+    assert result["batchItemFailures"] == []
+    assert len(result["predictions"]) == 1
+    assert "reason_codes" not in result["predictions"][0]
+
+
+def test_contribution_cache_skips_repeated_records():
+    booster, dv = _train_bundle()
+    explainer = model.ReasonCodeExplainer(approximate=True)
+    bundle = model.ModelBundle(booster, dv, "run-1")
+    features = [model.prep_features(dict(model.WARMUP_RECORD, EXT_SOURCE_3=v)) for v in (0.1, 0.9, float("nan"))]
+    dmatrix = xgb.DMatrix(dv.transform(features))
+
+    first = explainer.contributions(bundle, features, dmatrix)
+    bundle.booster = None  # a cache miss would now fail, NaN records included
+    second = explainer.contributions(bundle, features, dmatrix)
+
+    np.testing.assert_array_equal(first, second)
+    assert len(explainer._cache) == 3
+
+
+def _mixed_batch():
+    """Records 1, 2 and 4 are good; 3 is not base64-encoded JSON; 5 has no data_id."""
+    good = [_kinesis_event(dict(model.WARMUP_RECORD, EXT_SOURCE_3=v), data_id=i)["Records"][0]
+            for i, v in ((1, 0.1), (2, 0.5), (4, 0.9))]
+    bad_payload = {"kinesis": {"data": "not-base64!!", "sequenceNumber": "3"}}
+    no_id = base64.b64encode(json.dumps({"data": model.WARMUP_RECORD}).encode("utf-8")).decode("utf-8")
+    missing_id = {"kinesis": {"data": no_id, "sequenceNumber": "5"}}
+    return {"Records": [good[0], good[1], bad_payload, good[2], missing_id]}
+
+
+def test_poison_record_stops_batch_without_rescoring_good_records():
+    booster, dv = _train_bundle()
+    scored = []
+    model_service = model.ModelService(booster, dv, callbacks=[scored.append])
+
+    result = model_service.lambda_handler(_mixed_batch())
+
+    assert [p["data_id"] for p in result["predictions"]] == [1, 2]
+    assert result["batchItemFailures"] == [{"itemIdentifier": "3"}]
+    # Records after the failure are left for the retry, not scored twice
+    assert [p["data_id"] for p in scored] == [1, 2]
+
+
+def test_poison_records_go_to_dead_letter_sink(tmp_path):
+    booster, dv = _train_bundle()
+    dead_letter = model.LocalDeadLetterSink(str(tmp_path / "dead_letter.jsonl"))
+    model_service = model.ModelService(booster, dv, dead_letter=dead_letter)
+
+    result = model_service.lambda_handler(_mixed_batch())
+
+    assert [p["data_id"] for p in result["predictions"]] == [1, 2, 4]
+    assert result["batchItemFailures"] == []
+    with open(tmp_path / "dead_letter.jsonl") as f_in:
+        entries = [json.loads(line) for line in f_in]
+    assert [e["sequenceNumber"] for e in entries] == ["3", "5"]
+    assert "KeyError" in entries[1]["error"]
+
+
+def test_failed_callback_reports_that_record():
+    booster, dv = _train_bundle()
+
+    def flaky_sink(prediction_event):
+        if prediction_event["data_id"] == 2:
+            raise ConnectionError("stream unavailable")
+
+    model_service = model.ModelService(booster, dv, callbacks=[flaky_sink])
+    event = {"Records": [_kinesis_event(model.WARMUP_RECORD, data_id=i)["Records"][0] for i in (1, 2, 3)]}
+
+    result = model_service.lambda_handler(event)
+
+    assert [p["data_id"] for p in result["predictions"]] == [1]
+    assert result["batchItemFailures"] == [{"itemIdentifier": "2"}]
+
+
+def _packed_record(data: dict, data_id: int):
+    payload = base64.b64encode(model.encode_record(data, data_id, packed=True)).decode("utf-8")
+    return {"kinesis": {"data": payload, "sequenceNumber": str(data_id)}}
+
+
+def test_packed_record_round_trip():
+    record = dict(model.WARMUP_RECORD, PHONE_CHANGE_GROUP="unheard-of", FLOORSMAX_AVG=None)
+    batch = model.FeatureBatch(1)
+    model.PACKED_SCHEMAS[1].decode_into([model.encode_record(record, 42, packed=True)], batch, [0])
+
+    expected = model.prep_features(dict(record, PHONE_CHANGE_GROUP=""))
+    assert batch.data_ids == [42]
+    assert batch.cats[0].tolist() == [expected[c] for c in model.cat_cols]
+    assert batch.nums[0] == pytest.approx([expected[c] for c in model.num_cols], rel=1e-6)
+
+
+def test_nan_scores_the_same_in_json_and_packed_records():
+    booster, dv = _train_bundle()
+    model_service = model.ModelService(booster, dv)
+    record = dict(model.WARMUP_RECORD, EXT_SOURCE_3=float("nan"), FLOORSMAX_AVG=None)
+    event = {"Records": [
+        _kinesis_event(record, data_id=1)["Records"][0],
+        _packed_record(record, 2),
+    ]}
+
+    batch, _, _ = model_service.decode_records(event["Records"])
+    result = model_service.lambda_handler(event)
+
+    assert np.isnan(batch.nums[:, model.num_cols.index("EXT_SOURCE_3")]).all()
+    assert (batch.nums[:, model.num_cols.index("FLOORSMAX_AVG")] == 0.0).all()
+    probs = [p["default_probability"] for p in result["predictions"]]
+    assert probs[0] == pytest.approx(probs[1], abs=1e-6)
+
+
+def test_vocabulary_encoder_matches_dict_vectorizer():
+    records = [
+        model.prep_features(dict(model.WARMUP_RECORD, AGE_GROUP=age, EXT_SOURCE_1=ext))
+        for age, ext in (("Youth", 0.0), ("Elder", 0.3), ("Middle_Age", 0.7))
+    ]
+    dv = DictVectorizer().fit(records[:2])  # "Middle_Age" is unseen, 0.0 must stay stored
+
+    expected = dv.transform(records)
+    actual = model.VocabularyEncoder.from_vectorizer(dv).transform(model.FeatureBatch.from_dicts(records))
+
+    assert (actual.indptr == expected.indptr).all()
+    assert (actual.indices == expected.indices).all()
+    assert np.allclose(actual.data, expected.data)
+
+
+def test_mixed_json_and_packed_batch_scores_in_order():
+    booster, dv = _train_bundle()
+    model_service = model.ModelService(booster, dv)
+    bad_packed = {"kinesis": {"data": base64.b64encode(b"\xcd\x01short").decode("utf-8"), "sequenceNumber": "3"}}
+    event = {"Records": [
+        _kinesis_event(model.WARMUP_RECORD, data_id=1)["Records"][0],
+        _packed_record(model.WARMUP_RECORD, 2),
+        bad_packed,
+        _packed_record(model.WARMUP_RECORD, 4),
+    ]}
+
+    result = model_service.lambda_handler(event)
+
+    assert [p["data_id"] for p in result["predictions"]] == [1, 2]
+    assert result["batchItemFailures"] == [{"itemIdentifier": "3"}]
+    probs = [p["default_probability"] for p in result["predictions"]]
+    assert probs[0] == pytest.approx(probs[1], abs=1e-6)
+
+
+def test_batch_score_keeps_nan_and_defaults_nulls_like_json_records():
+    import pyarrow as pa
+
+    records = [dict(model.WARMUP_RECORD, EXT_SOURCE_3=float("nan")), dict(model.WARMUP_RECORD, EXT_SOURCE_3=None)]
+    batch = pa.RecordBatch.from_pylist(records)
+
+    features = batch_score.feature_batch(batch)
+
+    expected = model.FeatureBatch.from_dicts(records)
+    np.testing.assert_array_equal(features.nums, expected.nums)
+    assert np.isnan(features.nums[0, model.num_cols.index("EXT_SOURCE_3")])
+    assert features.nums[1, model.num_cols.index("EXT_SOURCE_3")] == 0.0
+
+
+def test_serving_bundle_round_trip_without_vectorizer(tmp_path):
+    booster, dv = _train_bundle()
+    bundle_path = tmp_path / "xgb_credit_pred.serving.zip"
+    with open(bundle_path, "wb") as f_out:
+        model.write_serving_bundle(booster, dv, f_out)
+
+    with open(bundle_path, "rb") as f_in:
+        loaded_booster, encoder = model.read_bundle(f_in)
+
+    assert isinstance(encoder, model.VocabularyEncoder)
+    assert encoder.vocabulary_ == dv.vocabulary_
+    features = model.prep_features(model.WARMUP_RECORD)
+    expected = model.ModelService(booster, dv).predict(features)
+    assert model.ModelService(loaded_booster, encoder).predict(features) == pytest.approx(expected)
+
+
+def test_pickled_bundle_without_sklearn_points_to_serving_bundle():
+    # What unpickling a DictVectorizer looks like in the sklearn-free image
+    raw = b"cno_such_module\nDictVectorizer\n."
+
+    with pytest.raises(ImportError, match="export_serving_bundle"):
+        model.read_bundle(io.BytesIO(raw))
+
+
+def test_importing_model_loads_no_backends():
+    code = "import sys, model; print(sorted(m for m in ('boto3', 'sklearn', 'xgboost') if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(model.__file__))).stdout
+    assert output.strip().splitlines()[-1] == "[]"
+
+
+def _raw_applications():
+    rng = np.random.default_rng(1)
+    n = 500
+    raw = {
+        "DAYS_BIRTH": -rng.integers(19 * 365, 70 * 365, n).astype(float),
+        "DAYS_EMPLOYED": -rng.integers(0, 52 * 365, n).astype(float),
+        "DAYS_LAST_PHONE_CHANGE": -rng.integers(0, 12 * 365, n).astype(float),
+        "REGION_RATING_CLIENT_W_CITY": rng.integers(1, 4, n).astype(float),
+        "REGION_RATING_CLIENT": rng.integers(1, 4, n).astype(float),
+    }
+    for col in model.RawApplicationTransform.MEDIAN_COLS:
+        raw[col] = np.where(rng.random(n) < 0.3, np.nan, rng.random(n))
+    # bin edges, the unemployed placeholder and a missing phone change
+    raw["DAYS_BIRTH"][:4] = [-25 * 365, -26 * 365, -60 * 365 - 364, -19 * 365]
+    raw["DAYS_EMPLOYED"][:4] = [model.UNEMPLOYED_DAYS, -365, -50 * 365, -5 * 365 + 1]
+    raw["DAYS_LAST_PHONE_CHANGE"][:4] = [np.nan, -547, -548, 0.0]
+    return raw
+
+
+def test_raw_transform_matches_training_notebook():
+    import pandas as pd
+
+    raw = _raw_applications()
+    transform = model.RawApplicationTransform.fit(raw)
+    batch = transform.transform(raw)
+
+    # The training notebook's steps, verbatim
+    app_df = pd.DataFrame(raw)
+    for col in model.RawApplicationTransform.MEDIAN_COLS:
+        app_df[col] = app_df[col].fillna(app_df[col].median())
+    app_df['DAYS_LAST_PHONE_CHANGE'] = app_df['DAYS_LAST_PHONE_CHANGE'].fillna(757)
+    app_df_days = [i for i in app_df if i.startswith('DAYS')]
+    app_df[app_df_days] = abs(app_df[app_df_days])
+    app_df['DAYS_BIRTH'] = (app_df['DAYS_BIRTH'] / 365).astype(int)
+    app_df['AGE_GROUP'] = pd.cut(app_df['DAYS_BIRTH'], bins=[19, 25, 40, 60, 100],
+                                 labels=['Very_Young', 'Youth', 'Middle_Age', 'Elder'])
+    app_df['DAYS_EMPLOYED_YEARS'] = (app_df['DAYS_EMPLOYED'].replace(365243, 0))
+    app_df['DAYS_EMPLOYED_YEARS'] = (app_df['DAYS_EMPLOYED_YEARS'] / 365).astype(int)
+    app_df['YEARS_EMPLOYED_GROUP'] = pd.cut(app_df['DAYS_EMPLOYED_YEARS'], bins=[0, 1, 5, 10, 20, 30, 40, 50],
+                                            labels=['unemployed and <1 yr', '1-5 yrs', '5-10 yrs', '10-20 yrs',
+                                                    '20-30 yrs', '30-40 yrs', '40-50 yrs'], right=False)
+    app_df['DAYS_LAST_PHONE_CHANGE_YEARS'] = round(app_df['DAYS_LAST_PHONE_CHANGE'] / 365)
+    app_df['PHONE_CHANGE_GROUP'] = pd.cut(app_df['DAYS_LAST_PHONE_CHANGE_YEARS'], bins=[-1, 1, 4, float('inf')],
+                                          labels=['Recent', 'Moderate', 'Old'])
+
+    for j, col in enumerate(model.cat_cols):
+        assert batch.cats[:, j].tolist() == app_df[col].astype(object).fillna("").tolist()
+    assert (batch.nums == app_df[model.num_cols].to_numpy()).all()
+
+    restored = model.RawApplicationTransform.from_dict(json.loads(json.dumps(transform.to_dict())))
+    assert (restored.transform(raw).cats == batch.cats).all()
+
+
+def test_raw_application_records_are_scored_with_bundle_transform():
+    booster, dv = _train_bundle()
+    raw = _raw_applications()
+    transform = model.RawApplicationTransform.fit(raw)
+    record = {col: float(raw[col][10]) for col in model.RAW_COLS}
+    batch = transform.transform({col: raw[col][10:11] for col in model.RAW_COLS})
+    prebinned = {**dict(zip(model.cat_cols, batch.cats[0])), **dict(zip(model.num_cols, batch.nums[0].tolist()))}
+
+    without_transform = model.ModelService(booster, dv).lambda_handler(_kinesis_event(record))
+    assert without_transform["batchItemFailures"] == [{"itemIdentifier": "101"}]
+
+    model_service = model.ModelService(booster, model.VocabularyEncoder.from_vectorizer(dv, transform))
+    result = model_service.lambda_handler(_kinesis_event(record))
+    assert result["predictions"][0]["default_probability"] == pytest.approx(model_service.predict(prebinned))
@@ -0,0 +1,167 @@
+import os
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from common.features import CAT_COLS, NUM_COLS, FEATURE_COLS  # noqa: F401
+
+ARROW_SUFFIXES = (".arrow", ".feather", ".ipc")
+
+
+def _is_arrow_ipc(path: str) -> bool:
+    return path.endswith(ARROW_SUFFIXES)
+
+
+def _downcast_type(column: pa.ChunkedArray) -> pa.DataType:
+    """
+    Returns the narrowest type that holds `column` without changing what
+    the model sees. Floats go to float32 because XGBoost casts its input
+    to float32 anyway. Integers shrink to the smallest type that holds
+    their min/max.
+    """
+    dtype = column.type
+    if pa.types.is_float64(dtype):
+        return pa.float32()
+    if pa.types.is_integer(dtype) and len(column) > 0:
+        bounds = pc.min_max(column)
+        lo, hi = bounds["min"].as_py(), bounds["max"].as_py()
+        if lo is None:
+            return dtype
+        for candidate in (np.int8, np.int16, np.int32):
+            info = np.iinfo(candidate)
+            if info.min <= lo and hi <= info.max:
+                return pa.from_numpy_dtype(candidate)
+    return dtype
+
+
+def optimize_table(table: pa.Table, categorical=CAT_COLS, downcast: bool = True) -> pa.Table:
+    """Dictionary-encodes categorical columns and downcasts numerics."""
+    fields = []
+    for field, column in zip(table.schema, table.columns):
+        dtype = field.type
+        if field.name in categorical:
+            if not pa.types.is_dictionary(dtype):
+                dtype = pa.dictionary(pa.int32(), pa.string())
+        elif downcast and not field.name.startswith("__index_level_"):
+            dtype = _downcast_type(column)
+        fields.append(pa.field(field.name, dtype, field.nullable))
+
+    schema = pa.schema(fields, metadata=table.schema.metadata)
+    if schema.equals(table.schema):
+        return table
+    return table.cast(schema)
+
+
+def read_table(path: str, columns=None, categorical=CAT_COLS, downcast: bool = True,
+               memory_map: bool = True) -> pa.Table:
+    """
+    Reads a Parquet or Arrow IPC (.arrow/.feather) file as an Arrow table,
+    projecting to `columns` before any data is decoded.
+    Categorical columns are read straight into dictionary arrays.
+    With `memory_map=True` the file is mapped instead of read into the heap.
+    """
+    if _is_arrow_ipc(path):
+        source = pa.memory_map(path) if memory_map else pa.OSFile(path)
+        table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(columns)
+    else:
+        present = pq.read_schema(path, memory_map=memory_map).names
+        read_dictionary = [c for c in categorical if c in present and (columns is None or c in columns)]
+        table = pq.read_table(
+            path,
+            columns=columns,
+            memory_map=memory_map,
+            read_dictionary=read_dictionary,
+        )
+    return optimize_table(table, categorical=categorical, downcast=downcast)
+
+
+def read_frame(path: str, columns=None, categorical=CAT_COLS, downcast: bool = True,
+               memory_map: bool = True) -> pd.DataFrame:
+    """Same as `read_table`, converted to pandas with `category` dtypes."""
+    table = read_table(path, columns, categorical=categorical, downcast=downcast, memory_map=memory_map)
+    return table.to_pandas(self_destruct=True)
+
+
+def iter_frames(path: str, batch_size: int, columns=None, categorical=CAT_COLS,
+                downcast: bool = True, memory_map: bool = True):
+    """
+    Yields `batch_size`-row DataFrames from a Parquet file without
+    materialising the whole file.
+    """
+    parquet_file = pq.ParquetFile(path, memory_map=memory_map)
+    present = parquet_file.schema_arrow.names
+    read_dictionary = [c for c in categorical if c in present and (columns is None or c in columns)]
+    if read_dictionary:
+        parquet_file = pq.ParquetFile(path, memory_map=memory_map, read_dictionary=read_dictionary)
+
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        table = optimize_table(pa.Table.from_batches([batch]), categorical=categorical, downcast=downcast)
+        yield table.to_pandas()
+
+
+def write_arrow(df: pd.DataFrame, path: str):
+    """Writes `df` as an uncompressed Arrow IPC file that `read_table` can memory-map."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+class LazyParquet:
+    """
+    Deferred handle on a Parquet/Arrow file. Nothing is read until
+    `.frame` is first accessed, so it is safe to create at module level.
+    """
+
+    def __init__(self, path: str, columns=None, categorical=CAT_COLS, downcast: bool = True,
+                 memory_map: bool = True):
+        self.path = path
+        self.columns = columns
+        self.categorical = categorical
+        self.downcast = downcast
+        self.memory_map = memory_map
+
+    def __repr__(self):
+        return f"LazyParquet({self.path!r}, columns={self.columns!r})"
+
+    @cached_property
+    def frame(self) -> pd.DataFrame:
+        return read_frame(
+            self.path,
+            self.columns,
+            categorical=self.categorical,
+            downcast=self.downcast,
+            memory_map=self.memory_map,
+        )
+
+    @property
+    def loaded(self) -> bool:
+        return "frame" in self.__dict__
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def iter_frames(self, batch_size: int):
+        if self.loaded:
+            frame = self.frame
+            for start in range(0, len(frame), batch_size):
+                yield frame.iloc[start:start + batch_size]
+            return
+        yield from iter_frames(
+            self.path,
+            batch_size,
+            self.columns,
+            categorical=self.categorical,
+            downcast=self.downcast,
+            memory_map=self.memory_map,
+        )
+
+    def release(self):
+        self.__dict__.pop("frame", None)
@@ -0,0 +1,12 @@
+# Model input columns. Kept free of heavy imports so the serving module can
+# use them too.
+CAT_COLS = ['AGE_GROUP', 'YEARS_EMPLOYED_GROUP', 'PHONE_CHANGE_GROUP']
+NUM_COLS = [
+    'REGION_RATING_CLIENT_W_CITY',
+    'REGION_RATING_CLIENT',
+    'EXT_SOURCE_3',
+    'EXT_SOURCE_2',
+    'EXT_SOURCE_1',
+    'FLOORSMAX_AVG'
+]
+FEATURE_COLS = NUM_COLS + CAT_COLS
@@ -0,0 +1,132 @@
+"""
+The training notebook's preprocessing of raw application fields, shared by
+the preprocessing stage and the serving module. Needs numpy only, so the
+serving images ship it without pandas or pyarrow.
+"""
+import math
+
+import numpy as np
+
+from common.features import CAT_COLS, NUM_COLS
+
+# Raw Home Credit fields the bins are derived from (day counts are negative, relative to the application)
+RAW_DAY_COLS = ['DAYS_BIRTH', 'DAYS_EMPLOYED', 'DAYS_LAST_PHONE_CHANGE']
+RAW_COLS = RAW_DAY_COLS + NUM_COLS
+DAYS_PER_YEAR = 365
+UNEMPLOYED_DAYS = 365243  # DAYS_EMPLOYED placeholder for applicants without a job
+
+
+def _to_float(val) -> float:
+    try:
+        return float(val) if val is not None else math.nan
+    except (ValueError, TypeError):
+        return math.nan
+
+
+class FeatureColumns:
+    """
+    Model features of `size` records: categoricals as strings, numerics as
+    float64. RawApplicationTransform writes into these (or into the
+    serving module's FeatureBatch, which extends it).
+    """
+
+    def __init__(self, size: int):
+        self.cats = np.full((size, len(CAT_COLS)), "", dtype=object)
+        self.nums = np.zeros((size, len(NUM_COLS)), dtype=np.float64)
+
+    def __len__(self):
+        return len(self.nums)
+
+
+class RawApplicationTransform:
+    """
+    The training notebook's preprocessing of raw application fields:
+    median imputation of EXT_SOURCE_* and FLOORSMAX_AVG, a fixed fill for
+    DAYS_LAST_PHONE_CHANGE, abs() on the DAYS_* fields, then pd.cut-style
+    binning into AGE_GROUP, YEARS_EMPLOYED_GROUP and PHONE_CHANGE_GROUP.
+    Fitted once and stored in the model bundle. Applied to whole batches
+    with np.searchsorted; values outside every bin become "" (missing).
+    """
+
+    # output column -> (source column, (bin edges, labels, right-closed)) as in the notebook
+    DEFAULT_BINS = {
+        'AGE_GROUP': ('DAYS_BIRTH', [19, 25, 40, 60, 100],
+                      ['Very_Young', 'Youth', 'Middle_Age', 'Elder'], True),
+        'YEARS_EMPLOYED_GROUP': ('DAYS_EMPLOYED', [0, 1, 5, 10, 20, 30, 40, 50],
+                                 ['unemployed and <1 yr', '1-5 yrs', '5-10 yrs', '10-20 yrs',
+                                  '20-30 yrs', '30-40 yrs', '40-50 yrs'], False),
+        'PHONE_CHANGE_GROUP': ('DAYS_LAST_PHONE_CHANGE', [-1, 1, 4, math.inf],
+                               ['Recent', 'Moderate', 'Old'], True),
+    }
+    MEDIAN_COLS = ['EXT_SOURCE_3', 'EXT_SOURCE_2', 'EXT_SOURCE_1', 'FLOORSMAX_AVG']
+    PHONE_CHANGE_FILL = 757.0  # the notebook's hard-coded mode
+
+    def __init__(self, fill_values: dict, bins: dict = None):
+        self.fill_values = {col: float(val) for col, val in fill_values.items()}
+        self.bins = {
+            col: (source, np.asarray(edges, dtype=np.float64), np.asarray(list(labels) + [""], dtype=object), right)
+            for col, (source, edges, labels, right) in (bins or self.DEFAULT_BINS).items()
+        }
+
+    @classmethod
+    def fit(cls, columns):
+        """Fits the imputation constants on training columns (a mapping of name -> array)."""
+        fill_values = {col: float(np.nanmedian(np.asarray(columns[col], dtype=np.float64))) for col in cls.MEDIAN_COLS}
+        fill_values['DAYS_LAST_PHONE_CHANGE'] = cls.PHONE_CHANGE_FILL
+        return cls(fill_values)
+
+    @classmethod
+    def from_dict(cls, state: dict):
+        bins = {col: (b["source"], b["edges"], b["labels"], b["right"]) for col, b in state["bins"].items()}
+        return cls(state["fill_values"], bins)
+
+    def to_dict(self) -> dict:
+        return {
+            "fill_values": self.fill_values,
+            "bins": {
+                col: {"source": source, "edges": edges.tolist(), "labels": labels[:-1].tolist(), "right": right}
+                for col, (source, edges, labels, right) in self.bins.items()
+            },
+        }
+
+    @staticmethod
+    def columns_from_dicts(records) -> dict:
+        """Raw records -> {column: float64 array}, NaN where a field is missing or invalid."""
+        return {col: np.array([_to_float(r.get(col)) for r in records], dtype=np.float64) for col in RAW_COLS}
+
+    def _years(self, source: str, days: np.ndarray) -> np.ndarray:
+        days = np.abs(days)
+        if source == 'DAYS_EMPLOYED':
+            days = np.where(days == UNEMPLOYED_DAYS, 0.0, days)
+        years = days / DAYS_PER_YEAR
+        # the notebook truncates with astype(int), except phone change which is round()ed
+        return np.round(years) if source == 'DAYS_LAST_PHONE_CHANGE' else np.trunc(years)
+
+    def transform_into(self, columns: dict, batch: FeatureColumns, rows=None):
+        """Writes the transformed columns into `batch` (at `rows`, default all rows)."""
+        rows = np.arange(len(batch)) if rows is None else np.asarray(rows)
+        filled = {}
+        for col in RAW_COLS:
+            values = np.asarray(columns[col], dtype=np.float64)
+            if col in self.fill_values:
+                values = np.where(np.isnan(values), self.fill_values[col], values)
+            filled[col] = values
+
+        for j, col in enumerate(CAT_COLS):
+            source, edges, labels, right = self.bins[col]
+            years = self._years(source, filled[source])
+            # pd.cut: (e[i], e[i+1]] when right-closed, [e[i], e[i+1]) otherwise; NaN sorts past the end
+            idx = np.searchsorted(edges, years, side="left" if right else "right") - 1
+            idx = np.where((idx >= 0) & (idx < len(edges) - 1), idx, len(labels) - 1)
+            batch.cats[rows, j] = labels[idx]
+        for j, col in enumerate(NUM_COLS):
+            batch.nums[rows, j] = np.nan_to_num(filled[col], nan=0.0)
+        return batch
+
+    def transform(self, columns: dict) -> FeatureColumns:
+        return self.transform_into(columns, FeatureColumns(len(columns[RAW_COLS[0]])))
+
+
+def is_raw_application(data: dict) -> bool:
+    """Raw records carry DAYS_* fields instead of the pre-binned groups."""
+    return not any(col in data for col in CAT_COLS) and any(col in data for col in RAW_DAY_COLS)
@@ -0,0 +1,36 @@
+"""
+Layout of the sklearn-free serving bundle: a zip with the booster in
+UBJSON, the vectorizer's vocabulary as JSON and, optionally, the raw
+application transform. Writing one only needs the booster and anything
+with DictVectorizer's `vocabulary_`/`separator`, so training flows can log
+serving bundles without importing the serving module.
+"""
+import json
+import zipfile
+
+# The serving bundle loads without sklearn; the pickled bundle is what the
+# training notebook logs and is converted with export_serving_bundle.py
+SERVING_BUNDLE_ARTIFACT = "xgb_credit_pred.serving.zip"
+PICKLED_BUNDLE_ARTIFACT = "xgb_credit_pred.bin"
+
+SERVING_MODEL_ENTRY = "model.ubj"
+SERVING_VOCABULARY_ENTRY = "vocabulary.json"
+SERVING_TRANSFORM_ENTRY = "transform.json"
+
+
+def vocabulary_state(dv) -> dict:
+    """JSON state of a DictVectorizer's (or VocabularyEncoder's) vocabulary."""
+    return {"vocabulary": {name: int(idx) for name, idx in dv.vocabulary_.items()}, "separator": dv.separator}
+
+
+def write_serving_bundle(booster, dv, fileobj, raw_transform=None):
+    """
+    Writes `booster`, the vocabulary of `dv` (DictVectorizer or
+    VocabularyEncoder) and the raw transform, if any, as a serving bundle.
+    """
+    raw_transform = raw_transform or getattr(dv, "raw_transform", None)
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED) as bundle:
+        bundle.writestr(SERVING_MODEL_ENTRY, bytes(booster.save_raw("ubj")))
+        bundle.writestr(SERVING_VOCABULARY_ENTRY, json.dumps(vocabulary_state(dv)))
+        if raw_transform is not None:
+            bundle.writestr(SERVING_TRANSFORM_ENTRY, json.dumps(raw_transform.to_dict()))
@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.feature_extraction import DictVectorizer
+
+from common import data_access
+
+X_VAL_PATH = os.path.join(os.path.dirname(__file__), "../../processed_data/X_val.parquet")
+
+
+def test_read_frame_projects_and_downcasts():
+    df = data_access.read_frame(X_VAL_PATH, columns=["EXT_SOURCE_3", "REGION_RATING_CLIENT", "AGE_GROUP"])
+
+    assert list(df.columns) == ["EXT_SOURCE_3", "REGION_RATING_CLIENT", "AGE_GROUP"]
+    assert df["EXT_SOURCE_3"].dtype == np.float32
+    assert df["REGION_RATING_CLIENT"].dtype == np.int8
+    assert isinstance(df["AGE_GROUP"].dtype, pd.CategoricalDtype)
+
+
+def test_object_strings_become_categories(tmp_path):
+    path = str(tmp_path / "objects.parquet")
+    pd.DataFrame({"AGE_GROUP": ["Youth", "Elder", None], "EXT_SOURCE_1": [0.1, 0.2, 0.3]}).to_parquet(path)
+
+    df = data_access.read_frame(path)
+
+    assert isinstance(df["AGE_GROUP"].dtype, pd.CategoricalDtype)
+    assert df["AGE_GROUP"].isna().sum() == 1
+
+
+def test_memory_mapped_arrow_matches_parquet(tmp_path):
+    path = str(tmp_path / "X_val.arrow")
+    data_access.write_arrow(pd.read_parquet(X_VAL_PATH), path)
+
+    from_arrow = data_access.read_frame(path, columns=data_access.FEATURE_COLS)
+    from_parquet = data_access.read_frame(X_VAL_PATH, columns=data_access.FEATURE_COLS)
+
+    pd.testing.assert_frame_equal(from_arrow, from_parquet.reset_index(drop=True), check_categorical=False)
+
+
+def test_downcast_does_not_change_predictions():
+    cols = data_access.CAT_COLS + data_access.NUM_COLS
+    original = pd.read_parquet(X_VAL_PATH)[cols].head(2000)
+    downcast = data_access.read_frame(X_VAL_PATH, columns=cols).head(2000)
+
+    dv = DictVectorizer()
+    X = dv.fit_transform(original.to_dict(orient="records"))
+    label = (original["EXT_SOURCE_3"].fillna(0.5) < 0.5).astype(int)
+    booster = xgb.train({"objective": "binary:logistic"}, xgb.DMatrix(X, label=label), num_boost_round=5)
+
+    expected = booster.predict(xgb.DMatrix(X))
+    actual = booster.predict(xgb.DMatrix(dv.transform(downcast.to_dict(orient="records"))))
+
+    np.testing.assert_array_equal(expected, actual)
+
+
+def test_lazy_parquet_defers_and_streams():
+    source = data_access.LazyParquet(X_VAL_PATH, columns=data_access.FEATURE_COLS)
+    assert not source.loaded
+
+    sizes = [len(batch) for batch in source.iter_frames(10000)]
+    assert not source.loaded
+    assert sum(sizes) == len(pd.read_parquet(X_VAL_PATH))
+
+    assert len(source.frame) == sum(sizes)
+    assert source.loaded
+    source.release()
+    assert not source.loaded